@@ -0,0 +1,166 @@
+# Benchmarks for Ice - run from this folder with:  python bench.py
+# The texts in the spam folder double as test documents.  Each stage of the
+# pipeline is timed on its own over a sweep of *m* and *p*, and the results
+# can be saved as JSON and compared against those of an earlier run:
+#   python bench.py -m 1,2,3 -p 0,500,1000 -o new.json --baseline old.json
+import io
+import json
+import sys
+import time
+
+import ice
+
+FIXTURES = ["spam/pg37106.txt", "spam/pg75990.txt", "spam/hadto.txt"]
+SNIPPETS = 10000 # Number of snippets made in the sampling and Zipf stages
+
+# This function returns the lines of the fixture *fn* and its size in bytes
+def load(fn):
+    with open(fn, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    return lines, sum(len(s.encode("utf-8")) for s in lines)
+
+# This function runs *f* *repeat* times and returns the best time taken,
+# calling *setup* (untimed) before each run if it is given
+def best_of(f, repeat, setup=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+# This function returns and prints the result of a stage which handled
+# *count* lines (or whatever *unit* is, such as snippets or files) and *size*
+# bytes in *secs* seconds
+def result(stage, m, p, fixture, secs, count, size, unit="lines"):
+    r = {"stage": stage, "m": m, "p": p, "fixture": fixture, "seconds": secs,
+         f"{unit}_per_s": count / secs, "mb_per_s": size / secs / 1e6}
+    print(f"{stage:<10} m={m!s:<4} p={p!s:<4} {fixture or '':<18} {count / secs:>12,.0f} {unit + '/s':<10} {r['mb_per_s']:>8.2f} MB/s")
+    return r
+
+# This function times loading the spam folder
+def bench_corpus(repeat=3):
+    secs = best_of(lambda: ice.SpamCorpus("spam"), repeat)
+    c = ice.SpamCorpus("spam")
+    return [result("corpus", None, None, "spam", secs, len(c.texts), sum(len(t.mm) for t in c.texts), "files")]
+
+# This function times sampling snippets of *m* words from the spam folder
+def bench_sampling(m, repeat=3):
+    corpus = ice.get_corpus("spam")
+    j = []
+    def run():
+        j[:] = corpus.sample(SNIPPETS, m)
+    secs = best_of(run, repeat)
+    return [result("sampling", m, None, "spam", secs, SNIPPETS, sum(len(s.encode("utf-8")) for s in j), "snippets")]
+
+# This function times making snippets of random words of average length *m*
+def bench_zipf(m, repeat=3):
+    w, l = ice.w_g("google-10000-english.txt")
+    zipf = ice.ZipfWords(w, l)
+    j = []
+    def run():
+        j[:] = zipf.junk(SNIPPETS, m)
+    secs = best_of(run, repeat)
+    return [result("zipf", m, None, "words", secs, SNIPPETS, sum(len(s.encode("utf-8")) for s in j), "snippets")]
+
+# This function times refilling an empty junk source
+def bench_refill(m, p, repeat=3):
+    junk_source = ice.JunkSource(m, p, "google-10000-english.txt")
+    def empty():
+        junk_source.n = 0
+    secs = best_of(junk_source.update_junkpile, repeat, empty)
+    size = sum(len(s.encode("utf-8")) for s in junk_source.ring)
+    return [result("refill", m, p, None, secs, junk_source.size, size, "snippets")]
+
+# This function times icing every line of each fixture.  The junk source holds
+# enough junk for a whole run and is filled before each, so that only the
+# icing is timed
+def bench_ice_line(m, p, repeat=3):
+    results = []
+    for fn in FIXTURES:
+        lines, size = load(fn)
+        junk_source = ice.JunkSource(m, p, "google-10000-english.txt", size=sum(len(s.split()) for s in lines) + 1)
+        def run():
+            for s in lines:
+                ice.ice_line(junk_source, s, m)
+        secs = best_of(run, repeat, junk_source.update_junkpile)
+        results.append(result("ice_line", m, p, fn, secs, len(lines), size))
+    return results
+
+# This function times icing each fixture as ice() does, a window of words at
+# a time, with the junk source filled before each run as above
+def bench_windowed(m, p, repeat=3):
+    results = []
+    for fn in FIXTURES:
+        lines, size = load(fn)
+        text = "".join(lines)
+        junk_source = ice.JunkSource(m, p, "google-10000-english.txt", size=sum(len(s.split()) for s in lines) + 1)
+        def run():
+            for _ in ice.ice_chunked(io.StringIO(text), m, junk_source=junk_source):
+                pass
+        secs = best_of(run, repeat, junk_source.update_junkpile)
+        results.append(result("windowed", m, p, fn, secs, len(lines), size))
+    return results
+
+# This function times cleaning the html out of each fixture once iced
+def bench_clean(m, p, repeat=3):
+    results = []
+    junk_source = ice.JunkSource(m, p, "google-10000-english.txt")
+    for fn in FIXTURES:
+        lines, _ = load(fn)
+        iced = [ice.ice_line(junk_source, s, m) for s in lines]
+        size = sum(len(s.encode("utf-8")) for s in iced)
+        def run():
+            for s in iced:
+                ice.clean(s)
+        results.append(result("clean", m, p, fn, best_of(run, repeat), len(iced), size))
+    return results
+
+# This function runs every benchmark over the values of *ms* and *ps*
+def bench_all(ms, ps, repeat=3):
+    results = bench_corpus(repeat)
+    for m in ms:
+        results += bench_sampling(m, repeat) + bench_zipf(m, repeat)
+        for p in ps:
+            results += bench_refill(m, p, repeat) + bench_ice_line(m, p, repeat)
+            results += bench_windowed(m, p, repeat) + bench_clean(m, p, repeat)
+    return results
+
+# This function prints how each result compares to the matching one in
+# *baseline*, as the ratio of their speeds
+def compare(results, baseline):
+    key = lambda r: (r["stage"], r["m"], r["p"], r["fixture"])
+    old = {key(r): r for r in baseline}
+    print("\nChange against baseline:")
+    for r in results:
+        if key(r) in old:
+            ratio = old[key(r)]["seconds"] / r["seconds"]
+            print(f"{r['stage']:<10} m={r['m']!s:<4} p={r['p']!s:<4} {r['fixture'] or '':<18} {ratio:>6.2f}x")
+
+if __name__ == "__main__":
+    ms = [1, 2, 3]
+    ps = [0, 500, 1000]
+    repeat = 3
+    out = None
+    baseline = None
+    args = iter(sys.argv[1:])
+    for a in args:
+        if a == "-m":
+            ms = [int(x) for x in next(args).split(",")]
+        elif a == "-p":
+            ps = [int(x) for x in next(args).split(",")]
+        elif a == "-r":
+            repeat = int(next(args))
+        elif a == "-o":
+            out = next(args)
+        elif a == "--baseline":
+            baseline = next(args)
+    results = bench_all(ms, ps, repeat)
+    if out:
+        with open(out, "w") as f:
+            json.dump({"python": sys.version, "time": time.time(), "results": results}, f, indent=1)
+    if baseline:
+        with open(baseline) as f:
+            compare(results, json.load(f)["results"])
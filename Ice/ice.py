@@ -1,161 +1,1579 @@
-import sys 
-import os
-import random
-import math as maths
-import re
-
-#########################################################
-# SECTION I. Sampling from PD texts
-#########################################################
-
-# This function reads and returns *c* random samples of approximately *m* words
-# from the file named *fn*, assuming it is encoded in Unicode utf-8
-def sample(fn, c, m=1):
-    m = m*5 + 5
-    with open(fn, "r", encoding="utf-8") as f:
-        s = [""]
-        l = f.seek(0, 2) # Maximum offset
-        while (c):
-            f.seek(int(random.random() * l))
-            try:
-                s.append(" ".join(f.read(m).split(" ")[1:-1]))
-            except:
-                continue
-            c -= 1
-        return s
-
-# This function reads and returns *c* random samples of approximately *m* words
-# from the given spam files
-def sample_all(c, m):
-    filelist = os.listdir("spam")
-    ind = len(filelist) - 1
-    breaks = [int(random.random() * c) for _ in range(ind)]
-    breaks.sort()
-    s = sample("spam/" + filelist[ind], c - breaks[ind - 1], m)
-    while(ind > 1):
-        ind -= 1
-        s += sample("spam/" + filelist[ind], breaks[ind] - breaks[ind - 1], m)
-    s += sample("spam/" + filelist[0], breaks[0], m)
-    return s 
-
-#####################################################################
-# SECTION II. Sampling from the Zipf-Mandelbrot distribution
-#####################################################################
-
-# This function gives the number of words in a random sample            
-def r(m=1):
-    return int(m/random.random())
-
-# This function, given a list *entities* of length *l*, gives each
-# one a probability of selection in rough accordance with the harmonic series
-def z(entities, l):
-    if (l == 0):
-        l = len(entities)
-    i = int(maths.exp(random.random() * (maths.log(l) + 0.5772) - 0.5772))
-    return entities[i] if i < l else entities[0]
-
-# This function produces a sample of random words given a list of them
-# in order from most to least frequent, using the functions above
-# *m* denotes the average length of the sample
-def r_j(w, l, m):
-    return " ".join(map(lambda _ : z(w, l), ([""] * r(m))))
-
-# This function retrieves a list of words from a text file
-# where each word is on a new line
-def w_g(fname="common_words.txt"):
-    with open(fname, "r") as f:
-        w = f.readlines()
-        return list(map(lambda x: x[:-1], w)), len(w)
-
-####################################################################
-# SECTION III. Icing text
-####################################################################
-
-# This function removes HTML tags from text
-def clean(text):
-    return re.sub(r"<[^<>]*>", " ", text)
-
-# This function returns a random span tag
-def get_span_class(real=False):
-    return random.choice(['c','n','s','t']) if real else random.choice(['a','e','i','o'])
-
-# This object makes and holds junk
-class JunkSource:
-    def __init__(self, m, p=0, cwordfile="common_words.txt"):
-        self.p = p 
-        self.m = m
-        self.w, self.l = w_g(cwordfile)
-        self.update_junkpile()
-        self.i = 0
-
-    def update_junkpile(self):
-        self.junkpile = [r_j(self.w, self.l, self.m) for _ in range(self.p)] + sample_all(1000 - self.p, self.m)
-        random.shuffle(self.junkpile)
-    
-    def get_junk(self, count):
-        n = self.i + count
-        j = self.junkpile[self.i:n]
-        if n >= 1000:
-            self.update_junkpile()
-            n -= 1000
-            j += self.junkpile[0:n]
-        self.i = n 
-        assert(len(j) == count)
-        return j
-
-# This function, given a pile of junk to add in and the source
-# with which to replenish it
-def ice_line(junk_source, line, m):
-    words = line.split()
-    w_index = len(words)
-    safeSpan = False
-    while (w_index):
-        w_index -= 1
-        if (random.random() > (1 / (1 << m))):
-            if safeSpan:
-                words[w_index] = f"<span class='{get_span_class(True)}'>" + words[w_index]
-                safeSpan = False
-            words[w_index] += f"<span class='{get_span_class(False)}'>" + junk_source.get_junk(1)[0] + "</span>"
-        elif random.random() > (1 / (1 << m)):
-            words[w_index] += "</span>"
-            safeSpan = True
-    if safeSpan:
-        words[0] = f"<span class='{get_span_class(True)}'>" + words[0]
-    return "<p>" + " ".join(words) + "</p>"
-        
-    
-
-# This function is the most important - it reads in a file or path
-# at *fname* and outputs a version with random junk hidden in "span"
-# tags or class 'a', 'e', 'i', anor 'o'; the original text is occasionally put
-# in "span" tags with class 't', 'n', 's', or 'c'.
-# The intensity of the junk is given by *m*; the permillage of it
-# coming from spam files is given by p
-def ice(fname, m, p):
-    # Retrieve list of random words
-    junksource = JunkSource(m, p, "google-10000-english.txt")
-
-    with open(fname, "r", encoding="utf-8") as f:
-        with open(fname.split(".")[0] + ".ice", "w", encoding="utf-8") as out:
-            s = f.readline()[:-1]
-            while (s):
-                o = ice_line(junksource, s, m)
-                print(clean(o))
-                out.write(o)
-                s = f.readline()
-
-if __name__ == "__main__":
-    m = 1
-    p = 0
-    n = len(sys.argv)
-    if (n < 2):
-        raise "Need filename to ice"
-    while(n):
-        if (sys.argv[n - 1] == "-m"):
-            m = int(sys.argv[n])
-        elif (sys.argv[n - 1] == "-p"):
-            p = int(sys.argv[n])
-        n -= 1
-    m = 1 if len(sys.argv) < 3 else int(sys.argv[2])
-    p = 0 if len(sys.argv) < 4 else int(sys.argv[2])
-    ice(sys.argv[1], m, p)
+import sys 
+import os
+import random
+import math as maths
+import re
+import json
+import gzip
+import bz2
+import lzma
+import codecs
+import hashlib
+import struct
+import stat
+import tempfile
+import glob
+import time
+import threading
+import multiprocessing
+import queue
+import asyncio
+import urllib.parse
+from http import HTTPStatus
+from itertools import accumulate, zip_longest
+import mmap
+from array import array
+
+#########################################################
+# SECTION 0. Instrumentation
+#########################################################
+
+# This object counts what happens during a run and keeps histograms of how
+# long things take, with buckets by powers of two of microseconds.  It is only
+# made if asked for (by enable_stats()); otherwise *stats* is None, and each
+# place that would record something costs a single check
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.times = {}
+
+    # This function adds *n* to the counter *name*
+    def count(self, name, n=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    # This function records that *name* took *secs* seconds
+    def time(self, name, secs):
+        with self.lock:
+            t = self.times.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "histogram": {}})
+            t["count"] += 1
+            t["total"] += secs
+            t["max"] = max(t["max"], secs)
+            b = str(1 << int(secs * 1e6).bit_length()) # Upper bound of the bucket, in microseconds
+            t["histogram"][b] = t["histogram"].get(b, 0) + 1
+
+    # This function returns everything recorded as a dictionary
+    def to_dict(self):
+        with self.lock:
+            return json.loads(json.dumps({"counts": self.counts, "times": self.times}))
+
+    # This function adds in the dictionary *d* recorded elsewhere
+    # (such as in another process)
+    def merge(self, d):
+        for name, n in d["counts"].items():
+            self.count(name, n)
+        with self.lock:
+            for name, u in d["times"].items():
+                t = self.times.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "histogram": {}})
+                t["count"] += u["count"]
+                t["total"] += u["total"]
+                t["max"] = max(t["max"], u["max"])
+                for b, n in u["histogram"].items():
+                    t["histogram"][b] = t["histogram"].get(b, 0) + n
+
+    # This function returns everything recorded, and starts again from nothing
+    def take(self):
+        d = self.to_dict()
+        with self.lock:
+            self.counts = {}
+            self.times = {}
+        return d
+
+    # This function returns a readable summary of everything recorded
+    def summary(self):
+        d = self.to_dict()
+        lines = [f"{name}: {n}" for name, n in sorted(d["counts"].items())]
+        for name, t in sorted(d["times"].items()):
+            lines.append(f"{name}: {t['count']} in {t['total']:.4f} s "
+                         f"(mean {t['total'] / t['count'] * 1e6:.1f} us, max {t['max'] * 1e6:.1f} us)")
+        return "\n".join(lines)
+
+    # This function writes everything recorded as JSON to the file *fname*
+    def dump(self, fname):
+        with open(fname, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+stats = None
+
+def enable_stats():
+    global stats
+    stats = Stats()
+    return stats
+
+#########################################################
+# SECTION I. Sampling from PD texts
+#########################################################
+
+# This object memory-maps the text file named *fn* once, assuming it is encoded
+# in Unicode utf-8, and records where every run of spaces in it starts and ends;
+# snippets of whole words can then be sliced straight out of the map without
+# reopening it, and as spaces are never part of a multibyte character, they
+# always decode
+class SpamText:
+    def __init__(self, fn):
+        with open(fn, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.mm = b"" # Empty files cannot be mapped
+        self.v = memoryview(self.mm)
+        self.s = array("q")
+        self.e = array("q")
+        for x in re.finditer(b" +", self.mm):
+            self.s.append(x.start())
+            self.e.append(x.end())
+        self.l = len(self.s)
+
+    # This function returns a random snippet of *m* whole words
+    def snippet(self, m=1):
+        i = int(random.random() * (self.l - m))
+        return str(self.v[self.e[i]:self.s[i + m]], "utf-8")
+
+# This object holds every file in the directory *dirname* as a SpamText
+class SpamCorpus:
+    def __init__(self, dirname="spam"):
+        self.texts = [SpamText(os.path.join(dirname, fn)) for fn in sorted(os.listdir(dirname))]
+
+    # This function returns *c* random snippets of *m* words, drawn evenly from
+    # those texts long enough to supply them
+    def sample(self, c, m=1):
+        texts = [t for t in self.texts if t.l > m]
+        if stats:
+            stats.count("samples", c)
+            stats.count("short texts skipped", len(self.texts) - len(texts))
+        if not texts:
+            if stats:
+                stats.count("empty samples", c)
+            return [""] * c
+        return [random.choice(texts).snippet(m) for _ in range(c)]
+
+# Texts and corpora are loaded once per file or directory and then shared
+# between all callers
+spamtexts = {}
+corpora = {}
+
+def get_corpus(dirname="spam"):
+    if dirname not in corpora:
+        corpora[dirname] = SpamCorpus(dirname)
+    return corpora[dirname]
+
+# This function reads and returns *c* random samples of approximately *m* words
+# from the file named *fn*, assuming it is encoded in Unicode utf-8
+def sample(fn, c, m=1):
+    if fn not in spamtexts:
+        spamtexts[fn] = SpamText(fn)
+    t = spamtexts[fn]
+    return [t.snippet(m) for _ in range(c)] if t.l > m else [""] * c
+
+# This function reads and returns *c* random samples of approximately *m* words
+# from the given spam files
+def sample_all(c, m):
+    return get_corpus("spam").sample(c, m)
+
+#####################################################################
+# SECTION II. Sampling from the Zipf-Mandelbrot distribution
+#####################################################################
+
+# This function gives the number of words in a random sample            
+def r(m=1):
+    return int(m/random.random())
+
+# This function, given a list *entities* of length *l*, gives each
+# one a probability of selection in rough accordance with the harmonic series
+def z(entities, l):
+    if (l == 0):
+        l = len(entities)
+    i = int(maths.exp(random.random() * (maths.log(l) + 0.5772) - 0.5772))
+    return entities[i] if i < l else entities[0]
+
+# This function produces a sample of random words given a list of them
+# in order from most to least frequent, using the functions above
+# *m* denotes the average length of the sample
+def r_j(w, l, m):
+    return " ".join(map(lambda _ : z(w, l), ([""] * r(m))))
+
+# This function gives the cumulative Zipf-Mandelbrot weights of *l* words,
+# 1 / (k + q)^s for the k-th, as a packed array of doubles, made once for each
+# (l, s, q) and shared.  (The default, s = 1 and q = 0, needs no table; see
+# ZipfWords.)  A Vocabulary keeps its tables in files of its own instead
+zipf_tables = {}
+
+def zipf_table(l, s=1, q=0):
+    if (l, s, q) not in zipf_tables:
+        zipf_tables[(l, s, q)] = array("d", accumulate((k + q) ** -s for k in range(1, l + 1)))
+    return zipf_tables[(l, s, q)]
+
+# This object draws words from a list *w* of length *l*, in order from most to
+# least frequent, many at a time.  By default (s = 1, q = 0) the ranks are
+# drawn with the formula of z(), which inverts the approximation of the
+# harmonic series log k + 0.5772, and so needs no table; otherwise a whole
+# batch is drawn by a single call to random.choices, given a table of the
+# cumulative weights.  The first HOT_WORDS words are kept as a list of strings,
+# so that the words drawn most often are quick to look up even if *w* is a
+# Vocabulary
+HOT_WORDS = 1 << 16
+
+class ZipfWords:
+    def __init__(self, w, l=0, s=1, q=0):
+        self.l = l if l else len(w)
+        self.w = w
+        self.hot = list(w[:min(self.l, HOT_WORDS)])
+        if s == 1 and q == 0:
+            self.cdf = None
+        elif isinstance(w, Vocabulary) and self.l == len(w):
+            self.cdf = w.zipf_cdf(s, q)
+        else:
+            self.cdf = zipf_table(self.l, s, q)
+
+    # This function draws the ranks (from 0) of *k* words
+    def ranks(self, k):
+        if self.cdf is None:
+            t = maths.log(self.l) + 0.5772
+            exp, rand = maths.exp, random.random
+            return [int(exp(rand() * t - 0.5772)) for _ in range(k)]
+        return random.choices(range(self.l), cum_weights=self.cdf, k=k)
+
+    # This function draws *k* words
+    def draw(self, k):
+        hot = self.hot
+        if self.l <= HOT_WORDS:
+            return [hot[i] for i in self.ranks(k)]
+        w = self.w
+        return [hot[i] if i < HOT_WORDS else w[i] for i in self.ranks(k)]
+
+    # This function produces *c* samples of random words of average length *m*,
+    # as r_j() would, drawing the lengths and then every word in bulk
+    def junk(self, c, m):
+        lengths = [r(m) for _ in range(c)]
+        words = self.draw(sum(lengths))
+        j = []
+        i = 0
+        for n in lengths:
+            j.append(" ".join(words[i:i + n]))
+            i += n
+        return j
+
+# This function retrieves a list of words from a text file
+# where each word is on a new line
+def w_g(fname="common_words.txt"):
+    with open(fname, "r") as f:
+        w = f.readlines()
+        return list(map(lambda x: x[:-1], w)), len(w)
+
+# This function writes the pieces of bytes *parts* to the file *fn*, with the
+# permissions *mode*, under a name of its own first and then moved into place,
+# so that no other process ever sees (or moves) a half-written file
+def write_replace(fn, parts, mode):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fn) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(parts)
+        os.chmod(tmp, mode) # Made only readable by this user, or others could not share it
+        os.replace(tmp, fn)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+# This function maps the file *fn* for reading, returning None if it cannot
+def map_file(fn):
+    try:
+        with open(fn, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+# This object holds a list of words, one per line of the text file *fname*,
+# as a single block of utf-8 with an array of the offsets at which each word
+# starts, making strings only of the words asked for.  The block and offsets
+# are kept in a binary cache file beside the list (unless *cache* is unset),
+# which is memory-mapped, so that loading it is quick and the memory it takes
+# is shared by every process using it; the cache is rebuilt whenever the size
+# or modification time of the list changes, into a new file that replaces the
+# old, so that processes with the old one mapped keep it as it was.  Cache
+# files are given the permissions of the list, so that whoever can read the
+# one can share the other
+VOCAB_MAGIC = b"ICEVOCB1"
+VOCAB_HEADER = struct.Struct("<8sQQQ") # Magic, number of words, size and modification time of the list
+ZIPF_MAGIC = b"ICEZIPF1"
+ZIPF_HEADER = struct.Struct("<8sQQQdd") # Magic, number of words, size and modification time of the list, s, q
+
+class Vocabulary:
+    def __init__(self, fname, cache=True):
+        st = os.stat(fname)
+        self.fname = fname
+        self.st = st
+        self.use_cache = cache
+        self.cache = fname + ".vocab"
+        if not (cache and self.load(st)):
+            with open(fname, "rb") as f:
+                words = f.read().splitlines()
+            offsets = array("q", [0])
+            offsets.extend(accumulate(len(x) for x in words))
+            blob = b"".join(words)
+            header = VOCAB_HEADER.pack(VOCAB_MAGIC, len(words), st.st_size, st.st_mtime_ns)
+            self.mm = header + offsets.tobytes() + blob
+            if cache:
+                try:
+                    write_replace(self.cache, [self.mm], stat.S_IMODE(st.st_mode))
+                except OSError:
+                    pass
+            self.view(len(words))
+
+    # This function maps the cache file if it is up to date with the list
+    # whose os.stat is *st*, returning whether it could
+    def load(self, st):
+        mm = map_file(self.cache)
+        if mm is None or len(mm) < VOCAB_HEADER.size:
+            return False
+        magic, l, size, mtime = VOCAB_HEADER.unpack_from(mm)
+        if magic != VOCAB_MAGIC or size != st.st_size or mtime != st.st_mtime_ns:
+            return False
+        end = VOCAB_HEADER.size + 8 * (l + 1) # The offsets and block must be all there
+        if len(mm) < end or len(mm) < end + struct.unpack_from("<q", mm, end - 8)[0]:
+            return False
+        self.mm = mm
+        self.view(l)
+        return True
+
+    # This function sets up views of the offsets and block of *l* words
+    def view(self, l):
+        v = memoryview(self.mm)
+        end = VOCAB_HEADER.size + 8 * (l + 1)
+        self.offsets = v[VOCAB_HEADER.size:end].cast("q")
+        self.blob = v[end:]
+        self.l = l
+
+    # This function returns the cumulative Zipf-Mandelbrot weights of the
+    # words for *s* and *q*, as zipf_table() gives them, from a cache file
+    # beside the list which is memory-mapped (and made, if it is missing or
+    # out of date, as the vocabulary's own is)
+    def zipf_cdf(self, s, q):
+        fn = f"{self.fname}.zipf-{s!r}-{q!r}"
+        header = ZIPF_HEADER.pack(ZIPF_MAGIC, self.l, self.st.st_size, self.st.st_mtime_ns, s, q)
+        end = ZIPF_HEADER.size + 8 * self.l
+        mm = map_file(fn) if self.use_cache else None
+        if mm is None or len(mm) < end or mm[:ZIPF_HEADER.size] != header:
+            mm = header + zipf_table(self.l, s, q).tobytes()
+            zipf_tables.pop((self.l, s, q)) # Kept here instead
+            if self.use_cache:
+                try:
+                    write_replace(fn, [mm], stat.S_IMODE(self.st.st_mode))
+                except OSError:
+                    pass
+        return memoryview(mm)[ZIPF_HEADER.size:end].cast("d")
+
+    def __len__(self):
+        return self.l
+
+    # Slices of words are decoded in one go, and cut up by their offsets if
+    # they are all ascii (when bytes and characters line up)
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self.l)
+            if step == 1 and start < stop:
+                o = self.offsets[start:stop + 1]
+                s = str(self.blob[o[0]:o[-1]], "utf-8")
+                if len(s) == o[-1] - o[0]:
+                    base = o[0]
+                    return [s[a - base:b - base] for a, b in zip(o, o[1:])]
+            return [self[k] for k in range(start, stop, step)]
+        if i < 0:
+            i += self.l
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+# Vocabularies are loaded once per file and then shared between all callers
+vocabularies = {}
+
+def get_vocabulary(fname):
+    if fname not in vocabularies:
+        vocabularies[fname] = Vocabulary(fname)
+    return vocabularies[fname]
+
+####################################################################
+# SECTION III. Icing text
+####################################################################
+
+# This function removes HTML tags from text
+def clean(text):
+    return re.sub(r"<[^<>]*>", " ", text)
+
+# This function returns a random span tag
+def get_span_class(real=False):
+    return random.choice(['c','n','s','t']) if real else random.choice(['a','e','i','o'])
+
+# This object keeps pools of junk made on earlier runs in the directory
+# *dirname*, one file for each setting, so that a run can start from junk
+# already made.  Each file holds the snippets as a block of utf-8 with an array
+# of the offsets at which each starts; the files least recently used are
+# deleted once they take up more than *limit* bytes together
+JUNK_MAGIC = b"ICEJUNK1"
+JUNK_HEADER = struct.Struct("<8sQ") # Magic, number of snippets
+STALE_TMP = 3600 # Seconds after which a half-written pool is taken to be left by a process that died
+
+class JunkCache:
+    def __init__(self, dirname="junk_cache", limit=64 << 20):
+        self.dirname = dirname
+        self.limit = limit
+        os.makedirs(dirname, exist_ok=True)
+
+    # This function returns the name of the pool for the setting (*m*, *p*,
+    # *s*, *q*) with the words from *cwordfile*.  The name takes in the size
+    # and modification time of the word list and of every spam file, so that
+    # pools made before any of them changed are never used again
+    def key(self, m, p, s, q, cwordfile, spamdir="spam"):
+        files = [cwordfile] + [os.path.join(spamdir, fn) for fn in sorted(os.listdir(spamdir))]
+        prints = [(fn, os.stat(fn).st_size, os.stat(fn).st_mtime_ns) for fn in files]
+        return hashlib.sha1(repr((m, p, s, q, prints)).encode("utf-8")).hexdigest()
+
+    # This function returns the pool named *key*, or an empty list if there is
+    # none, marking it as just used
+    def load(self, key):
+        fn = os.path.join(self.dirname, key + ".junk")
+        try:
+            with open(fn, "rb") as f:
+                data = f.read()
+            os.utime(fn)
+        except OSError:
+            return []
+        if len(data) < JUNK_HEADER.size:
+            return []
+        magic, c = JUNK_HEADER.unpack_from(data)
+        if magic != JUNK_MAGIC:
+            return []
+        end = JUNK_HEADER.size + 8 * (c + 1)
+        offsets = memoryview(data)[JUNK_HEADER.size:end].cast("q")
+        blob = memoryview(data)[end:]
+        return [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(c)]
+
+    # This function saves the snippets *j* as the pool named *key*, and then
+    # deletes the least recently used pools until the rest fit in the limit,
+    # along with any half-written ones left by processes that died
+    def store(self, key, j):
+        j = [s.encode("utf-8") for s in j]
+        offsets = array("q", [0])
+        offsets.extend(accumulate(len(s) for s in j))
+        fn = os.path.join(self.dirname, key + ".junk")
+        # Written as write_replace() writes, so that other processes storing the
+        # same pool at once never see a half-written file, and with the
+        # permissions of the directory (but never executable), so that whoever
+        # can use the cache can read it
+        write_replace(fn, [JUNK_HEADER.pack(JUNK_MAGIC, len(j)), offsets.tobytes(), b"".join(j)],
+                      stat.S_IMODE(os.stat(self.dirname).st_mode) & 0o666)
+        pools = []
+        stale = time.time() - STALE_TMP
+        for e in os.scandir(self.dirname):
+            if e.name.endswith((".junk", ".tmp")):
+                try:
+                    st = e.stat()
+                    if e.name.endswith(".tmp") and st.st_mtime < stale:
+                        os.remove(e.path)
+                        continue
+                except FileNotFoundError: # Removed by another process
+                    continue
+                pools.append((st.st_mtime_ns, st.st_size, e.path))
+        pools.sort(reverse=True)
+        total = 0
+        for _, size, path in pools:
+            total += size
+            if total > self.limit and path != fn and path.endswith(".junk"): # Others' files being written are counted, but kept
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+# The cache used by junk sources not given one of their own, if any
+junk_cache = None
+
+def enable_junk_cache(dirname="junk_cache", limit=64 << 20):
+    global junk_cache
+    junk_cache = JunkCache(dirname, limit)
+    return junk_cache
+
+# This object makes and holds junk in a ring of *size* snippets, of which
+# *p* in every thousand are random words and the rest come from the spam files.
+# Once no more than *low* snippets are left, the ring is topped up - by a
+# background thread if *prefetch* is set, so that callers need never wait on
+# it, or otherwise on the spot when it runs dry.  Making junk takes about
+# twice as long as icing with it, so a thread sharing the interpreter with the
+# icing cannot keep up; the thread instead takes batches of junk ready made by
+# *producers* processes of their own (see produce_junk()) - by default
+# PRODUCERS, or as many as there are cores to spare - making it itself only if
+# there are none, or processes cannot be started from this one.
+# Given a JunkCache (*cache*, which defaults to junk_cache; False for none),
+# junk is taken from the pool kept for this setting before any is made, and
+# a fresh pool of *pool* snippets is made and stored in the background for the
+# next run.  If *stored* is given, it is used instead of the pool in the cache
+# (which is then only refreshed), as when workers share out a pool between them
+PRODUCERS = 3 # Enough to make junk faster than one process ices with it
+BATCHES_AHEAD = 8 # Batches the producers may have ready at once
+
+class JunkSource:
+    def __init__(self, m, p=0, cwordfile="common_words.txt", s=1, q=0, size=1000, low=0, prefetch=False,
+                 cache=None, pool=10000, stored=None, producers=None):
+        self.p = p 
+        self.m = m
+        self.w = get_vocabulary(cwordfile)
+        self.l = len(self.w)
+        self.zipf = ZipfWords(self.w, self.l, s, q)
+        self.pool = [] if stored is None else stored
+        self.refresher = None
+        self.size = size
+        self.low = low if low else size // 4
+        self.batches = None
+        self.producers = []
+        if producers is None: # On a single core, processes only add to the work
+            producers = min(PRODUCERS, (os.cpu_count() or 1) - 1)
+        if prefetch and producers and not multiprocessing.current_process().daemon:
+            # Spawned afresh rather than forked, so as not to hold on to the
+            # files and sockets this process has open (such as the server's)
+            ctx = multiprocessing.get_context("spawn")
+            self.batches = ctx.Queue(BATCHES_AHEAD)
+            self.batches.cancel_join_thread()
+            for _ in range(producers):
+                proc = ctx.Process(target=produce_junk, daemon=True, args=(
+                    self.batches, m, p, cwordfile, s, q, size - self.low, stats is not None))
+                proc.start()
+                self.producers.append(proc)
+        cache = junk_cache if cache is None else cache
+        if cache:
+            key = cache.key(m, p, s, q, cwordfile)
+            if stored is None:
+                self.pool = cache.load(key)
+                if stats:
+                    stats.count("junk from cache", len(self.pool))
+            self.refresher = threading.Thread(target=lambda: cache.store(key, self.make_fresh(pool)), daemon=True)
+            self.refresher.start()
+        self.ring = [""] * size
+        self.i = 0 # Index of the next snippet to hand out
+        self.n = 0 # Number of snippets waiting in the ring
+        self.update_junkpile()
+        self.cv = None
+        if prefetch:
+            self.cv = threading.Condition()
+            self.running = True
+            self.thread = threading.Thread(target=self.prefetch, daemon=True)
+            self.thread.start()
+
+    # This function produces *c* snippets, taking them from the pool first
+    def make_junk(self, c):
+        j = self.pool[-c:] if c else []
+        del self.pool[len(self.pool) - len(j):]
+        if len(j) < c:
+            j += self.make_fresh(c - len(j))
+        return j
+
+    # This function produces *c* fresh snippets, shuffled together
+    def make_fresh(self, c):
+        t = time.perf_counter()
+        k = (c * self.p + 500) // 1000
+        j = self.zipf.junk(k, self.m) + sample_all(c - k, self.m)
+        random.shuffle(j)
+        if stats:
+            stats.time("refill", time.perf_counter() - t)
+            stats.count("junk made", c)
+        return j
+
+    # This function places the snippets *j* after those already waiting
+    def put_junk(self, j):
+        start = self.i + self.n
+        for k in range(len(j)):
+            self.ring[(start + k) % self.size] = j[k]
+        self.n += len(j)
+
+    # This function fills the ring up to capacity
+    def update_junkpile(self):
+        self.put_junk(self.make_junk(self.size - self.n))
+
+    # This function returns the next batch of junk for the ring (of no more
+    # than the *c* snippets a refill adds), taking it from the pool first and
+    # then from the producers, if there are any, or None once closed.  If the
+    # producers have none ready by the time the ring is down to the low-water
+    # mark (as while they are starting, or if they have died), it is made here
+    def next_batch(self, c):
+        if self.pool or not self.producers:
+            return self.make_junk(min(c, len(self.pool)) if self.pool else c)
+        while self.running:
+            try:
+                j, d = self.batches.get(timeout=0.01)
+            except queue.Empty:
+                if self.n <= self.low:
+                    return self.make_junk(c)
+                continue
+            merge_stats(d)
+            return j
+        return None
+
+    # This function runs in the background, topping up the ring whenever it
+    # falls to the low-water mark; the next batch is got ready outside the
+    # lock, before it is needed, so that the ring can still be drawn from
+    def prefetch(self):
+        while True:
+            j = self.next_batch(self.size - self.low)
+            with self.cv:
+                self.cv.wait_for(lambda: self.n <= self.low or not self.running)
+                if not self.running or j is None:
+                    return
+                self.put_junk(j)
+                self.cv.notify_all()
+
+    # This function stops the background thread and the producers, if there
+    # are any, and waits for the fresh pool to be stored
+    def close(self):
+        if self.refresher:
+            self.refresher.join()
+            self.refresher = None
+        if self.cv:
+            with self.cv:
+                self.running = False
+                self.cv.notify_all()
+            self.thread.join()
+            self.cv = None
+        for proc in self.producers:
+            proc.terminate()
+            proc.join()
+        self.producers = []
+        if self.batches:
+            self.batches.close()
+            self.batches = None
+
+    # This function returns a single snippet of junk
+    def next_junk(self):
+        if self.cv:
+            with self.cv:
+                if self.n <= self.low:
+                    self.cv.notify_all()
+                    if stats and not self.n:
+                        t = time.perf_counter()
+                        self.cv.wait_for(lambda: self.n)
+                        stats.time("waits for junk", time.perf_counter() - t)
+                    self.cv.wait_for(lambda: self.n)
+                j = self.ring[self.i]
+                self.i = (self.i + 1) % self.size
+                self.n -= 1
+                return j
+        if not self.n:
+            self.update_junkpile()
+        j = self.ring[self.i]
+        self.i = (self.i + 1) % self.size
+        self.n -= 1
+        return j
+
+    def get_junk(self, count):
+        return [self.next_junk() for _ in range(count)]
+
+# This function runs in each producer process of a junk source, making junk
+# for (*m*, *p*) as the source would, and putting it in the queue *batches*
+# *c* snippets at a time, with the statistics of making it if *record* is set.
+# The queue holds no more than BATCHES_AHEAD batches, so that the producers
+# stop once they are that far ahead and wait until they are needed again.
+# They stop for good if the process they make junk for dies without closing
+# its source
+def produce_junk(batches, m, p, cwordfile, s, q, c, record):
+    if record:
+        enable_stats()
+    source = JunkSource(m, p, cwordfile, s, q, size=1, cache=False)
+    parent = multiprocessing.parent_process()
+    batches.cancel_join_thread() # Or exiting would wait for batches no one will take
+    batch = None
+    while parent.is_alive():
+        if batch is None:
+            batch = (source.make_fresh(c), stats.take() if stats else None)
+        try:
+            batches.put(batch, timeout=1)
+            batch = None
+        except queue.Full:
+            pass
+
+# The opening tags of the spans, for real text and for junk
+REAL_SPANS = [f"<span class='{c}'>" for c in "cnst"]
+JUNK_SPANS = [f"<span class='{c}'>" for c in "aeio"]
+
+# This function, given a list of words, the source of junk to hide among
+# them and the random bytes *d* deciding how, adds the pieces of html for them
+# to the list *out* in reverse order, and returns whether a span of real text
+# is left to be opened before some earlier word.  Working back from the last
+# word, junk is put after each word with a probability of 1 - 1/2^m, and where
+# it is not, a span of real text may be closed, to be opened again before the
+# next junk.  The first byte for each word decides the junk (it is at least
+# *cut*, 256/2^m, which has the right probability to within the byte's
+# resolution), the second closes a span, and the third picks the classes.
+# *safeSpan* gives whether a span was left open by the words after these
+def ice_words(junk_source, words, d, cut, out, safeSpan=False):
+    for w_index in range(len(words) - 1, -1, -1):
+        k = 3 * w_index
+        if d[k] >= cut:
+            out += ("</span>", junk_source.next_junk(), JUNK_SPANS[d[k + 2] & 3], words[w_index])
+            if safeSpan:
+                out.append(REAL_SPANS[d[k + 2] >> 2 & 3])
+                safeSpan = False
+        elif not safeSpan and d[k + 1] >= cut:
+            out += ("</span>", words[w_index])
+            safeSpan = True
+        else:
+            out.append(words[w_index])
+        out.append(" ")
+    if words:
+        out.pop()
+    return safeSpan
+
+# This function gives what ice_words() would return for the random bytes *d*,
+# without making any html
+def span_state(d, cut, safeSpan=False):
+    for k in range(len(d) - 3, -1, -3):
+        if d[k] >= cut:
+            safeSpan = False
+        elif not safeSpan and d[k + 1] >= cut:
+            safeSpan = True
+    return safeSpan
+
+# This function, given a line and the source of junk to hide in it, returns
+# it as a paragraph of html.  All the random decisions are drawn as bytes in
+# one go, and the paragraph is built backwards as a list of pieces and joined
+# once
+def ice_line(junk_source, line, m):
+    if stats:
+        t = time.perf_counter()
+    words = line.split()
+    out = ["</p>"]
+    if ice_words(junk_source, words, random.randbytes(3 * len(words)), max(256 >> m, 1), out):
+        out.append(REAL_SPANS[random.getrandbits(2)])
+    out.append("<p>")
+    out.reverse()
+    o = "".join(out)
+    if stats:
+        stats.time("ice_line", time.perf_counter() - t)
+        stats.count("lines")
+        stats.count("words in", len(words))
+        stats.count("bytes in", len(line.encode("utf-8"))) # As given, with any line ending
+        stats.count("bytes out", len(o.encode("utf-8")))
+        stats.count("junk spans", sum(o.count(s) for s in JUNK_SPANS))
+        stats.count("real spans", sum(o.count(s) for s in REAL_SPANS))
+    return o
+
+# This function reads the file *f* in blocks of *block* characters and yields
+# its words in windows of at most *size*, each with whether it ends a
+# paragraph (a line), so that however long a line is, no more than a block
+# and a window of it is held at once.  Blank lines give empty windows.
+# The utf-8 bytes read are counted as the bytes in (unless *count* is unset),
+# as ice_line() counts those of the lines it is given, so both count the same
+# for the same file (which is its size, but for \r\n being read as \n)
+def windows(f, size=4096, block=1 << 16, count=True):
+    words = []
+    tail = ""
+    while True:
+        s = f.read(block)
+        if not s:
+            break
+        if stats and count:
+            stats.count("bytes in", len(s.encode("utf-8")))
+        lines = (tail + s).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            words += line.split()
+            while len(words) > size:
+                yield words[:size], False
+                words = words[size:]
+            yield words, True
+            words = []
+        # Move the whole words out of an unfinished line, keeping only the
+        # last (which may be cut off) to join with the next block
+        if len(tail) > block:
+            parts = tail.split()
+            tail = "" if tail[-1].isspace() or not parts else parts.pop()
+            words += parts
+            while len(words) > size:
+                yield words[:size], False
+                words = words[size:]
+    words += tail.split()
+    if words or tail:
+        yield words, True
+
+# This object ices the windows of words yielded by windows(), fed to it one
+# at a time, with junk from *junk_source*, returning the html in pieces.
+# A window's spans of real text depend on the random decisions for the words
+# after it, up to the next junk, so the decisions for each window are drawn as
+# it is fed and it is held back until those are known; this is almost always
+# by the end of the next window
+class WindowIcer:
+    def __init__(self, junk_source, m):
+        self.junk_source = junk_source
+        self.cut = max(256 >> m, 1)
+        self.pending = [] # Windows fed and not yet iced, as (words, decisions)
+        self.first = True # Whether the first of those starts a paragraph
+        self.line_time = 0 # Seconds spent icing the paragraph so far, for the statistics
+
+    # This function ices the first pending window, given whether a span of
+    # real text is left open by the words after it
+    def emit(self, safeSpan, last):
+        if stats:
+            t = time.perf_counter()
+        words, d = self.pending.pop(0)
+        out = ["</p>"] if last else [" "]
+        safeSpan = ice_words(self.junk_source, words, d, self.cut, out, safeSpan)
+        if self.first and safeSpan:
+            out.append(REAL_SPANS[random.getrandbits(2)])
+        if self.first:
+            out.append("<p>")
+        self.first = last
+        out.reverse()
+        o = "".join(out)
+        if stats: # As ice_line() records them, but for the bytes in, which windows() counts
+            self.line_time += time.perf_counter() - t
+            stats.count("windows")
+            stats.count("words in", len(words))
+            stats.count("bytes out", len(o.encode("utf-8")))
+            stats.count("junk spans", sum(o.count(s) for s in JUNK_SPANS))
+            stats.count("real spans", sum(o.count(s) for s in REAL_SPANS))
+            if last:
+                stats.count("lines")
+                stats.time("ice_line", self.line_time)
+                self.line_time = 0
+        return o
+
+    # This function takes the next window, *words*, which ends a paragraph if
+    # *last* is set, and returns the html for every window that can now be iced
+    def feed(self, words, last):
+        pending, cut = self.pending, self.cut
+        pending.append((words, random.randbytes(3 * len(words))))
+        out = []
+        if last:
+            safeSpan = False
+            states = []
+            for _, d in reversed(pending):
+                states.append(safeSpan)
+                safeSpan = span_state(d, cut, safeSpan)
+            while pending:
+                out.append(self.emit(states.pop(), len(pending) == 1))
+            return out
+        if cut >= 256: # No word can have junk, so no span is ever left open
+            return [self.emit(False, False)]
+        # Emit every window but the last once a later one has junk in it
+        while len(pending) > 1:
+            j = next((j for j in range(1, len(pending)) if any(b >= cut for b in pending[j][1][::3])), None)
+            if j is None:
+                break
+            safeSpan = span_state(pending[j][1], cut)
+            for i in range(j - 1, 0, -1):
+                safeSpan = span_state(pending[i][1], cut, safeSpan)
+            out.append(self.emit(safeSpan, False))
+        return out
+
+# This function ices the file *f* as ice_stream() would, but a window of words
+# at a time, yielding the html in pieces
+def ice_chunked(f, m, p=0, junk_source=None, size=4096, block=1 << 16):
+    own = junk_source is None
+    if own:
+        junk_source = JunkSource(m, p, "google-10000-english.txt", prefetch=True)
+    icer = WindowIcer(junk_source, m)
+    try:
+        for words, last in windows(f, size, block):
+            yield from icer.feed(words, last)
+    finally:
+        if own:
+            junk_source.close()
+
+# This function ices each line of the iterable *lines* in turn, yielding the
+# iced paragraphs one at a time so that no more than one is held in memory
+def ice_stream(lines, m, p=0, junk_source=None):
+    if junk_source is not None:
+        for line in lines:
+            yield ice_line(junk_source, line, m)
+        return
+    junk_source = JunkSource(m, p, "google-10000-english.txt", prefetch=True)
+    try:
+        for line in lines:
+            yield ice_line(junk_source, line, m)
+    finally:
+        junk_source.close()
+
+# This function writes the iced paragraphs *iced* to the file *out*, *batch*
+# paragraphs at a time, echoing their cleaned text to the console if *preview*
+# is set, and returns the number of paragraphs written
+def write_iced(out, iced, preview=False, batch=64):
+    b = []
+    n = 0
+    for o in iced:
+        if preview:
+            print(clean(o))
+        b.append(o)
+        n += o.endswith("</p>") # Pieces may be less than a paragraph
+        if len(b) >= batch:
+            out.writelines(b)
+            b.clear()
+    out.writelines(b)
+    return n
+
+# This function is the most important - it reads in a file or path
+# at *fname* and outputs a version with random junk hidden in "span"
+# tags or class 'a', 'e', 'i', anor 'o'; the original text is occasionally put
+# in "span" tags with class 't', 'n', 's', or 'c'.
+# The intensity of the junk is given by *m*; the permillage of it
+# coming from spam files is given by p.  Output is written *batch* paragraphs
+# at a time; if *preview* is set, the cleaned text is also echoed to the console.
+# Given more than one worker or a *seed*, the paragraphs are iced in parallel
+def ice(fname, m, p, preview=False, batch=64, workers=1, seed=None):
+    with open(fname, "r", encoding="utf-8") as f:
+        with open(os.path.splitext(fname)[0] + ".ice", "w", encoding="utf-8") as out:
+            if workers != 1 or seed is not None:
+                iced = ice_parallel(f, m, p, workers, seed)
+            else:
+                iced = ice_chunked(f, m, p)
+            write_iced(out, iced, preview, batch)
+
+####################################################################
+# SECTION IV. Icing in parallel
+####################################################################
+
+# Each worker process keeps a junk source of its own, and statistics of its
+# own if *record* is set, which are sent back with each piece of work.  If a
+# junk cache is in use, *shares* is a queue from which each worker takes its
+# own part of the stored pool, so that no two hand out the same junk.  The
+# workers never store a pool themselves, as they are stopped as soon as the
+# work runs out; the fresh pool is made in the parent (by refresh_pool())
+worker_junk = None
+
+def init_worker(m, p, record=False, shares=None):
+    global worker_junk
+    if record:
+        enable_stats()
+    stored = None
+    if shares is not None:
+        try:
+            stored = shares.get(timeout=10)
+        except queue.Empty: # A worker started after the others, to replace one
+            stored = []
+    worker_junk = JunkSource(m, p, "google-10000-english.txt", cache=False, stored=stored)
+
+# This function loads the pool stored for (*m*, *p*) in the junk cache, if
+# there is one, and returns a queue sharing it out between *workers* workers
+# for init_worker(), or None
+def worker_shares(m, p, workers):
+    if not junk_cache:
+        return None
+    workers = workers or os.cpu_count()
+    pool = junk_cache.load(junk_cache.key(m, p, 1, 0, "google-10000-english.txt"))
+    if stats:
+        stats.count("junk from cache", len(pool))
+    shares = multiprocessing.Queue()
+    for i in range(workers):
+        shares.put(pool[i::workers])
+    return shares
+
+# This function starts making a fresh pool for (*m*, *p*) in this process, to
+# be stored in the junk cache for the next run, returning the junk source
+# doing so (to be closed, which waits for it, once the workers are done), or
+# None if there is no cache
+def refresh_pool(m, p):
+    return JunkSource(m, p, "google-10000-english.txt", size=1, stored=[]) if junk_cache else None
+
+# This function adds the statistics *d* sent back by a worker to this
+# process's own
+def merge_stats(d):
+    if stats and d:
+        stats.merge(d)
+
+# This function ices one chunk of lines in a worker process.  If a seed is
+# given, the random state and the junk are reset from it and the chunk's
+# index, so that the output depends on neither the scheduling nor the number
+# of workers
+def ice_chunk(task):
+    seed, index, lines, m = task
+    if seed is not None:
+        random.seed(f"{seed}:{index}")
+        worker_junk.i = worker_junk.n = 0
+        worker_junk.update_junkpile()
+    return [ice_line(worker_junk, line, m) for line in lines], stats.take() if stats else None
+
+# This function groups the iterable *lines* into lists of *size*
+def chunks(lines, size):
+    c = []
+    for line in lines:
+        c.append(line)
+        if len(c) >= size:
+            yield c
+            c = []
+    if c:
+        yield c
+
+# This function ices the iterable *lines* in chunks of *chunk* paragraphs on
+# a pool of *workers* processes (by default, one per core), yielding the iced
+# paragraphs in their original order
+def ice_parallel(lines, m, p=0, workers=None, seed=None, chunk=256):
+    # Junk from the cache would make seeded output depend on earlier runs
+    shares = worker_shares(m, p, workers) if seed is None else None
+    fresh = refresh_pool(m, p) if seed is None else None
+    try:
+        with multiprocessing.Pool(workers, init_worker, (m, p, stats is not None, shares)) as pool:
+            tasks = ((seed, i, c, m) for i, c in enumerate(chunks(lines, chunk)))
+            for iced, d in pool.imap(ice_chunk, tasks):
+                merge_stats(d)
+                yield from iced
+    finally:
+        if fresh:
+            fresh.close()
+
+####################################################################
+# SECTION V. Icing many files
+####################################################################
+
+# This function expands the list *args* into the paths of the files to ice:
+# a directory stands for the files in it (but not the files Ice itself writes,
+# such as your_story.ice, your_story.ice.idx or your_story.m2p300.ice.gz), a
+# pattern for the files matching it, and "-" for the paths read one per line
+# from standard input
+ICED_NAME = re.compile(r"\.ice(\.|$)")
+
+def expand_paths(args):
+    paths = []
+    for a in args:
+        if a == "-":
+            paths += [s.strip() for s in sys.stdin if s.strip()]
+        elif os.path.isdir(a):
+            paths += [os.path.join(a, fn) for fn in sorted(os.listdir(a))
+                      if not ICED_NAME.search(fn) and os.path.isfile(os.path.join(a, fn))]
+        elif glob.has_magic(a):
+            paths += sorted(glob.glob(a))
+        else:
+            paths.append(a)
+    return paths
+
+# This function ices the file *fname* with the junk from *junk_source*,
+# returning its name, its size in bytes, the number of paragraphs in it, the
+# seconds taken to ice it, and None - or, if it could not be iced (as when it
+# is not utf-8), the reason why in place of the last, so that one bad file
+# does not stop a batch.  The output of a file that fails part way is removed
+def ice_file(fname, m, junk_source):
+    t = time.perf_counter()
+    oname = os.path.splitext(fname)[0] + ".ice"
+    out = None
+    try:
+        with open(fname, "r", encoding="utf-8") as f, open(oname, "w", encoding="utf-8") as out:
+            n = write_iced(out, ice_chunked(f, m, junk_source=junk_source))
+        return fname, os.path.getsize(fname), n, time.perf_counter() - t, None
+    except (OSError, UnicodeDecodeError) as e:
+        if out is not None: # The output was opened, so is incomplete
+            try:
+                os.remove(oname)
+            except OSError:
+                pass
+        return fname, 0, 0, time.perf_counter() - t, f"{type(e).__name__}: {e}"
+
+def batch_worker(task):
+    fname, m = task
+    return ice_file(fname, m, worker_junk), stats.take() if stats else None
+
+# This function ices every file in *paths*, loading the word list and spam
+# files just once - or once per process, given more than one *worker* - and
+# yields the statistics of each file as it is finished
+def ice_batch(paths, m, p=0, workers=1):
+    if workers == 1:
+        junk_source = JunkSource(m, p, "google-10000-english.txt", prefetch=True)
+        try:
+            for fname in paths:
+                yield ice_file(fname, m, junk_source)
+        finally:
+            junk_source.close()
+        return
+    shares = worker_shares(m, p, workers)
+    fresh = refresh_pool(m, p)
+    try:
+        with multiprocessing.Pool(workers, init_worker, (m, p, stats is not None, shares)) as pool:
+            for r, d in pool.imap(batch_worker, ((fname, m) for fname in paths)):
+                merge_stats(d)
+                yield r
+    finally:
+        if fresh:
+            fresh.close()
+
+# This function ices the files given by *args*, printing the throughput of
+# each and of the whole batch, and returns the number that could not be iced
+def run_batch(args, m, p=0, workers=1):
+    t = time.perf_counter()
+    size = count = failed = 0
+    for fname, s, n, secs, error in ice_batch(expand_paths(args), m, p, workers):
+        if error:
+            print(f"{fname}: failed, {error}")
+            failed += 1
+            continue
+        print(f"{fname}: {s} bytes, {n} paragraphs in {secs:.3f} s ({s / secs / 1e6:.2f} MB/s)")
+        size += s
+        count += 1
+    secs = time.perf_counter() - t
+    print(f"{count} files, {size} bytes in {secs:.3f} s ({size / secs / 1e6:.2f} MB/s, {count / secs:.1f} files/s)"
+          + (f"; {failed} failed" if failed else ""))
+    return failed
+
+####################################################################
+# SECTION VI. Icing as a service
+####################################################################
+
+# This function ices the string *text* with the junk from *junk_source*
+def ice_text(text, m, junk_source):
+    return "".join(ice_stream(text.splitlines(), m, junk_source=junk_source))
+
+# This object is a small HTTP server which ices the text POSTed to it, with
+# *m* and *p* given in the query string (e.g. POST /?m=2&p=300), and returns
+# the html.  It keeps warm junk sources for the *max_sources* (m, p) settings
+# used most recently, and ices in a pool of threads so that connections are
+# served concurrently.  Bodies longer than *max_body* bytes are refused
+class IceServer:
+    MAX_M = 16
+
+    def __init__(self, max_sources=8, max_body=16 << 20):
+        self.max_sources = max_sources
+        self.max_body = max_body
+        self.sources = {} # In order of last use
+        self.users = {} # Number of requests using each source
+        self.retired = set() # Sources evicted while still in use, to close when they are done with
+
+    # This function returns the junk source for (*m*, *p*), making it if need
+    # be, and marks it in use until it is given back with release().  The
+    # least recently used source is closed if there are too many
+    async def get_source(self, m, p):
+        loop = asyncio.get_running_loop()
+        if (m, p) not in self.sources:
+            s = await loop.run_in_executor(None, lambda: JunkSource(m, p, "google-10000-english.txt", prefetch=True))
+            if (m, p) in self.sources: # Another request made one in the meantime
+                loop.run_in_executor(None, s.close)
+            else:
+                self.sources[(m, p)] = s
+        s = self.sources.pop((m, p)) # Moved to the end, as the most recently used
+        self.sources[(m, p)] = s
+        self.users[s] = self.users.get(s, 0) + 1
+        while len(self.sources) > self.max_sources:
+            old = self.sources.pop(next(iter(self.sources)))
+            if old in self.users:
+                self.retired.add(old)
+            else:
+                loop.run_in_executor(None, old.close)
+        return s
+
+    def release(self, s):
+        self.users[s] -= 1
+        if not self.users[s]:
+            del self.users[s]
+            if s in self.retired:
+                self.retired.remove(s)
+                asyncio.get_running_loop().run_in_executor(None, s.close)
+
+    # This function answers a single request
+    async def respond(self, method, target, body):
+        if method != "POST":
+            return 405, "Only POST is supported\n"
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(target).query)
+        try:
+            m = int(query.get("m", ["1"])[0])
+            p = int(query.get("p", ["0"])[0])
+            text = body.decode("utf-8")
+        except ValueError:
+            return 400, "m and p must be integers and the text utf-8\n"
+        if not 0 <= m <= self.MAX_M or not 0 <= p <= 1000:
+            return 400, f"m must be between 0 and {self.MAX_M}, and p between 0 and 1000\n"
+        junk_source = await self.get_source(m, p)
+        loop = asyncio.get_running_loop()
+        try:
+            return 200, await loop.run_in_executor(None, ice_text, text, m, junk_source)
+        finally:
+            self.release(junk_source)
+
+    # This function serves the requests on one connection, keeping it alive
+    # until the client closes it or asks for it to be closed
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await reader.readline()
+                if not request.strip():
+                    break
+                method, target = request.decode("latin-1").split()[:2]
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if not h.strip():
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length", 0))
+                if not 0 <= length <= self.max_body: # Refused unread, so the connection cannot be kept
+                    status, html = 413, f"The text must be at most {self.max_body} bytes\n"
+                    headers["connection"] = "close"
+                else:
+                    if headers.get("expect", "").lower() == "100-continue": # Or the client waits before sending it
+                        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                        await writer.drain()
+                    status, html = await self.respond(method, target, await reader.readexactly(length))
+                html = html.encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                             f"Content-Type: text/html; charset=utf-8\r\n"
+                             f"Content-Length: {len(html)}\r\n\r\n".encode("latin-1") + html)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # This function serves forever on localhost at *port*, or on the Unix
+    # socket at *path* if one is given
+    async def serve(self, port=8462, path=None):
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for s in list(self.sources.values()) + list(self.retired):
+                s.close()
+
+####################################################################
+# SECTION VII. Re-icing edited files
+####################################################################
+
+# This function yields the hash by which each paragraph of the file *f* is
+# recognised, made from its words (which are all the icing depends on) a
+# window at a time, so that however long a paragraph is, it is never held
+# in memory at once
+def paragraph_hashes(f):
+    h = hashlib.blake2b(digest_size=16)
+    for words, last in windows(f, count=False):
+        if words:
+            h.update(("\n".join(words) + "\n").encode("utf-8"))
+        if last:
+            yield h.hexdigest()
+            h = hashlib.blake2b(digest_size=16)
+
+# This function ices the file at *fname* as ice() does, but keeps an index
+# beside the output (with the extension .ice.idx) of the hash of each
+# paragraph and where its iced version lies in the output.  When the file is
+# iced again with the same *m* and *p*, paragraphs whose hashes are in the
+# index are copied straight from the old output, and only new or changed ones
+# are iced.  The file is read twice, once for the hashes and once to ice it a
+# window at a time, as ice() does.  It returns the numbers of paragraphs
+# copied and iced
+INDEX_VERSION = 2 # Version 1 hashed whole lines as they were, rather than their words
+COPY_BLOCK = 1 << 20
+
+def ice_incremental(fname, m, p):
+    base = os.path.splitext(fname)[0]
+    oname = base + ".ice"
+    iname = base + ".ice.idx"
+    old = {}
+    try:
+        with open(iname, "r") as f:
+            index = json.load(f)
+        st = os.stat(oname)
+        if [index.get("version"), index["m"], index["p"], index["size"], index["mtime"]] == \
+                [INDEX_VERSION, m, p, st.st_size, st.st_mtime_ns]:
+            old = {h: (start, end) for h, start, end in index["paragraphs"]}
+    except (OSError, ValueError, KeyError):
+        pass
+    with open(fname, "r", encoding="utf-8") as f:
+        hashes = list(paragraph_hashes(f))
+    prev = open(oname, "rb") if old else None
+    junk_source = None
+    icer = None
+    paragraphs = []
+    copied = iced = 0
+    try:
+        with open(fname, "r", encoding="utf-8") as f, open(oname + ".tmp", "wb") as out:
+            pos = start = 0
+            for words, last in windows(f):
+                h = hashes[len(paragraphs)] if len(paragraphs) < len(hashes) else None # Unless the file changed since
+                if h in old:
+                    if last: # The paragraph's windows are skipped, and its old html copied
+                        begin, end = old[h]
+                        prev.seek(begin)
+                        for i in range(begin, end, COPY_BLOCK): # A block at a time, however long it is
+                            out.write(prev.read(min(COPY_BLOCK, end - i)))
+                        pos += end - begin
+                        copied += 1
+                else:
+                    if icer is None: # Only made if something needs icing
+                        junk_source = JunkSource(m, p, "google-10000-english.txt", prefetch=True)
+                        icer = WindowIcer(junk_source, m)
+                    for o in icer.feed(words, last):
+                        o = o.encode("utf-8")
+                        out.write(o)
+                        pos += len(o)
+                    iced += last
+                if last:
+                    paragraphs.append((h, start, pos))
+                    start = pos
+    finally:
+        if junk_source:
+            junk_source.close()
+        if prev:
+            prev.close()
+    os.replace(oname + ".tmp", oname)
+    st = os.stat(oname)
+    with open(iname, "w") as f:
+        json.dump({"version": INDEX_VERSION, "m": m, "p": p, "size": st.st_size, "mtime": st.st_mtime_ns,
+                   "paragraphs": paragraphs}, f)
+    return copied, iced
+
+####################################################################
+# SECTION VIII. De-icing
+####################################################################
+
+# This function reads the iced file *f* (opened in binary) in blocks of
+# *block* bytes and yields the real text in it, without the junk or any tags,
+# as pieces of at most about a block, each with whether it ends a paragraph.
+# It goes through the file once, looking only for the next "<" while in real
+# text, and for the next "</span>" while in junk.  A "<" that does not start
+# one of the tags Ice makes is taken as text
+def deice(f, block=1 << 16):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = b""
+    junk = False
+    text = []
+    size = 0
+    while True:
+        s = f.read(block)
+        buf += s
+        pos = 0
+        while True:
+            if junk:
+                i = buf.find(b"</span>", pos)
+                if i < 0:
+                    pos = max(pos, len(buf) - 6) # Keep what may be the start of the tag
+                    break
+                pos = i + 7
+                junk = False
+                continue
+            i = buf.find(b"<", pos)
+            if i < 0:
+                text.append(buf[pos:])
+                size += len(buf) - pos
+                pos = len(buf)
+                break
+            text.append(buf[pos:i])
+            size += i - pos
+            if s and len(buf) - i < 16: # The tag may be cut off; wait for the rest
+                pos = i
+                break
+            if buf.startswith(b"<span class='", i) and buf.startswith(b"'>", i + 14):
+                junk = buf[i + 13] in b"aeio"
+                pos = i + 16
+            elif buf.startswith(b"</span>", i):
+                pos = i + 7
+            elif buf.startswith(b"<p>", i):
+                pos = i + 3
+            elif buf.startswith(b"</p>", i):
+                yield decoder.decode(b"".join(text)), True
+                text = []
+                size = 0
+                pos = i + 4
+            else:
+                text.append(b"<")
+                pos = i + 1
+        buf = buf[pos:]
+        if size > block or (text and not s):
+            yield decoder.decode(b"".join(text), not s), False
+            text = []
+            size = 0
+        if not s:
+            return
+
+# This function yields the words of the real text in the iced file *f*, with
+# None at the end of each paragraph
+def deiced_words(f):
+    carry = ""
+    for s, end in deice(f):
+        s = carry + s
+        words = s.split()
+        carry = "" if end or not words or s[-1].isspace() else words.pop()
+        yield from words
+        if end:
+            yield None
+    if carry:
+        yield carry
+
+# This function yields the words of the text file *f* in the same way
+def source_words(f):
+    for words, last in windows(f, count=False):
+        yield from words
+        if last:
+            yield None
+
+# This function checks that de-icing the output of the file at *fname*
+# gives back its words, paragraph for paragraph.  It returns whether it does,
+# the paragraph and word at which they first differ (if they do) with the
+# words expected and found there, the size of the iced file and the seconds
+# taken
+def verify(fname):
+    t = time.perf_counter()
+    oname = os.path.splitext(fname)[0] + ".ice"
+    para = word = 0
+    ok = True
+    with open(fname, "r", encoding="utf-8") as f, open(oname, "rb") as iced:
+        for a, b in zip_longest(source_words(f), deiced_words(iced), fillvalue=False):
+            if a != b:
+                ok = False
+                break
+            if a is None:
+                para += 1
+                word = 0
+            else:
+                word += 1
+    return ok, para, word, (a, b) if not ok else None, os.path.getsize(oname), time.perf_counter() - t
+
+# This function verifies each file in *args* (expanded as for a batch),
+# printing the results and throughput, and returns whether all passed
+def run_verify(args):
+    passed = True
+    total = 0
+    t = time.perf_counter()
+    for fname in expand_paths(args):
+        ok, para, word, diff, size, secs = verify(fname)
+        total += size
+        if ok:
+            print(f"{fname}: ok, {para} paragraphs in {secs:.3f} s ({size / secs / 1e6:.2f} MB/s)")
+        else:
+            passed = False
+            print(f"{fname}: differs at paragraph {para + 1}, word {word + 1}: expected {diff[0]!r}, found {diff[1]!r}")
+    secs = time.perf_counter() - t
+    print(f"{'all passed' if passed else 'FAILED'}: {total} bytes in {secs:.3f} s ({total / secs / 1e6:.2f} MB/s)")
+    return passed
+
+####################################################################
+# SECTION IX. Many variants at once
+####################################################################
+
+# The ways the variants can be compressed, as the function to open the file
+# with and the extension it is given.  gzip is used at level 6 rather than its
+# default of 9, which takes longer than the icing for little gain
+COMPRESSORS = {
+    "gzip": (lambda name: gzip.open(name, "wt", 6, "utf-8"), ".gz"),
+    "bz2": (lambda name: bz2.open(name, "wt", encoding="utf-8"), ".bz2"),
+    "xz": (lambda name: lzma.open(name, "wt", encoding="utf-8"), ".xz"),
+    "none": (lambda name: open(name, "w", encoding="utf-8"), ""),
+}
+
+# This function ices the file at *fname* once for each (m, p) in *settings*,
+# reading and splitting it into words only once and feeding each window to
+# every variant in turn.  Each variant is written, compressed as *compress*
+# says, to a file named after the original and its setting, such as
+# your_story.m2p300.ice.gz; the names are returned
+def ice_variants(fname, settings, compress="gzip"):
+    opener, ext = COMPRESSORS[compress]
+    settings = list(dict.fromkeys(settings)) # Each setting only once
+    base = os.path.splitext(fname)[0]
+    names = [f"{base}.m{m}p{p}.ice{ext}" for m, p in settings]
+    sources = []
+    outs = []
+    try:
+        for m, p in settings:
+            sources.append(JunkSource(m, p, "google-10000-english.txt", prefetch=True))
+        icers = [WindowIcer(s, m) for s, (m, p) in zip(sources, settings)]
+        for name in names:
+            outs.append(opener(name))
+        with open(fname, "r", encoding="utf-8") as f:
+            for words, last in windows(f):
+                for icer, out in zip(icers, outs):
+                    out.writelines(icer.feed(words, last))
+    finally:
+        for out in outs:
+            out.close()
+        for s in sources:
+            s.close()
+    return names
+
+if __name__ == "__main__":
+    m = 1
+    p = 0
+    preview = False
+    workers = 1
+    seed = None
+    batch = False
+    serve = False
+    port = 8462
+    path = None
+    record = False
+    stats_file = None
+    cache = None
+    incremental = False
+    deicing = False
+    verifying = False
+    variants = None
+    compress = "gzip"
+    pos = []
+    args = iter(sys.argv[1:])
+    for a in args:
+        if a == "-m":
+            m = int(next(args))
+        elif a == "-p":
+            p = int(next(args))
+        elif a == "-j":
+            workers = int(next(args))
+            workers = workers if workers else None
+        elif a == "--seed":
+            seed = next(args)
+        elif a == "--serve":
+            serve = True
+        elif a == "--port":
+            port = int(next(args))
+        elif a == "--socket":
+            path = next(args)
+        elif a == "--batch":
+            batch = True
+        elif a == "--stats":
+            record = True
+        elif a == "--stats-json":
+            record = True
+            stats_file = next(args)
+        elif a == "--cache":
+            cache = next(args)
+        elif a == "--incremental":
+            incremental = True
+        elif a == "--deice":
+            deicing = True
+        elif a == "--verify":
+            verifying = True
+        elif a == "--variants":
+            variants = [tuple(int(x) for x in v.split(":")) for v in next(args).split(",")]
+        elif a == "--compress":
+            compress = next(args)
+        elif a == "--preview":
+            preview = True
+        else:
+            pos.append(a)
+    if record:
+        enable_stats()
+    if cache:
+        enable_junk_cache(cache)
+    try:
+        if serve:
+            asyncio.run(IceServer().serve(port, path))
+        elif not pos:
+            sys.exit("Need filename to ice")
+        elif deicing:
+            with open(pos[0], "rb") as f:
+                for s, end in deice(f):
+                    sys.stdout.write(s + "\n" if end else s)
+        elif verifying:
+            if not run_verify(pos):
+                sys.exit(1)
+        elif batch:
+            if run_batch(pos, m, p, workers):
+                sys.exit(1)
+        elif variants:
+            for name in ice_variants(pos[0], variants, compress):
+                print(name)
+        else:
+            if len(pos) > 1:
+                m = int(pos[1])
+            if len(pos) > 2:
+                p = int(pos[2])
+            if incremental:
+                copied, iced = ice_incremental(pos[0], m, p)
+                print(f"{iced} paragraphs iced, {copied} copied")
+            else:
+                ice(pos[0], m, p, preview, workers=workers, seed=seed)
+    finally:
+        if stats:
+            print(stats.summary(), file=sys.stderr)
+        if stats_file:
+            stats.dump(stats_file)
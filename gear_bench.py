@@ -0,0 +1,45 @@
+# Startup benchmark for gear_properties - run with:  python gear_bench.py [-r repeat] [--budget ms]
+# Times importing gear_properties in fresh interpreters, as a batch job or worker would, and checks that doing
+# so brings in neither tkinter nor NumPy.  Exits with an error if the best time is over budget (in milliseconds),
+# so that startup cost cannot creep back in unnoticed.
+
+import json
+import subprocess
+import sys
+
+BUDGET = 20 # ms
+
+# Run in each fresh interpreter; prints the time taken to import, and which heavy modules came with it
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import gear_properties
+t = time.perf_counter() - t
+print(json.dumps({"ms": t * 1000, "loaded": [m for m in ("tkinter", "numpy") if m in sys.modules]}))
+"""
+
+# This function returns the best import time in ms over repeat runs, and the heavy modules any run loaded
+def bench_import(repeat=10):
+    best = float("inf")
+    loaded = set()
+    for _ in range(repeat):
+        r = json.loads(subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout)
+        best = min(best, r["ms"])
+        loaded.update(r["loaded"])
+    return best, sorted(loaded)
+
+if __name__ == "__main__":
+    repeat = 10
+    budget = BUDGET
+    args = iter(sys.argv[1:])
+    for a in args:
+        if a == "-r":
+            repeat = int(next(args))
+        elif a == "--budget":
+            budget = float(next(args))
+    ms, loaded = bench_import(repeat)
+    print(f"import gear_properties: {ms:.2f} ms (budget {budget:g} ms)")
+    if loaded:
+        print("Also imported: " + ", ".join(loaded))
+    if ms > budget or loaded:
+        sys.exit(1)
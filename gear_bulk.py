@@ -0,0 +1,166 @@
+# Bulk gear calculations - reads gear specifications from a CSV or JSON-lines file, works out the rest of each
+# gear's properties, and writes them out again, a chunk of records at a time, so that files of any size can be
+# handled in a fixed amount of memory.  Run as:
+#   python gear_bulk.py [input] [-o output] [--from csv|jsonl] [--to csv|jsonl] [--chunk n] [--imperial]
+# Input and output default to stdin and stdout, and formats to those of the files' extensions (or CSV, or for
+# output to stdout, the input's format).
+# Columns are named as the properties of a gear (no_teeth, m, dp, d, od, id, w, v, t, f, p).  Each record's
+# properties are applied in the order pitch/module, number of teeth, diameters, then rotation speed, linear
+# speed, force, torque and power, just as if they were entered in that order in the window, so any that are
+# implied by those before them are recalculated.  Empty and missing fields are left out; other columns are
+# copied as they are.  Values are read as sfloat() reads them, so fractions such as 3/4 are allowed.  Values that
+# cannot be read or worked out are NaN, which JSON cannot hold, so they are written to JSON lines as null.
+
+import csv
+import json
+import math
+import sys
+from itertools import islice
+from types import SimpleNamespace
+
+import gear_engine
+from gear_engine import np
+from gear_properties import sfloat
+
+# Properties applied to each gear, in order, and the columns they are read from
+STEPS = [("p_o_m", "m"), ("p_o_m", "dp"), ("no_teeth", "no_teeth"), ("d", "d"), ("od", "od"), ("id", "id"),
+         ("w", "w"), ("v", "v"), ("f", "f"), ("t", "t"), ("p", "p")]
+COLUMNS = {name for _, name in STEPS}
+
+# A dict of strings to the numbers sfloat() reads them as, filled in as strings are first seen, since catalogs
+# repeat the same few values many times over.  It is emptied whenever it grows past limit, to keep memory bounded.
+# Strings which sfloat() fails on, such as "1/2/3" or "1/0", are NaN, and counted in errors.
+class Parsed(dict):
+    def __init__(self, limit=1 << 16):
+        self.limit = limit
+        self.errors = 0
+
+    def __missing__(self, string):
+        try:
+            value = float(sfloat(string))
+        except (ValueError, ZeroDivisionError):
+            value = math.nan
+            self.errors += 1
+        if len(self) >= self.limit:
+            self.clear()
+        self[string] = value
+        return value
+
+    # Reads a field from a CSV (always a string) or JSON file (a string or a number); blanks are None
+    def field(self, value):
+        if value is None or isinstance(value, (int, float)):
+            return value
+        return None if value.strip() == "" else self[value]
+
+# This function works out the properties of the gears given by columns, a dict of column names to lists of values
+# (None where a value is not given), and returns them as a dict of property names to lists
+def evaluate(columns, size, metric=True):
+    steps = [(prop, name) for prop, name in STEPS if name in columns]
+    if np is not None: # Work out the whole chunk at once
+        g = gear_engine.GearSet(size, metric)
+        for prop, name in steps:
+            present = np.array([v is not None for v in columns[name]])
+            if not present.any():
+                continue
+            values = np.array([0 if v is None else v for v in columns[name]], dtype=float)
+            if name in ("m", "dp") and (name == "m") != metric: # Pitch for module, or module for pitch
+                values = np.divide(1, values, out=np.full(size, math.nan), where=values != 0)
+            old = {k: getattr(g, k) for k in gear_engine.FIELDS}
+            gear_engine.calculate(g, prop, values)
+            if not present.all(): # Gears without the value are left as they were
+                for k in gear_engine.FIELDS:
+                    setattr(g, k, np.where(present, getattr(g, k), old[k]))
+        return {k: getattr(g, k).tolist() for k in gear_engine.FIELDS}
+    results = {k: [] for k in gear_engine.FIELDS}
+    done = {} # Gears worked out already, by their values, as catalogs list many alike
+    for spec in zip(*(columns[name] for _, name in steps)) if steps else [()] * size:
+        if spec not in done:
+            g = SimpleNamespace(metric=metric, **gear_engine.DEFAULTS)
+            for (prop, name), value in zip(steps, spec):
+                if value is None:
+                    continue
+                if name in ("m", "dp") and (name == "m") != metric:
+                    value = 1 / value if value else math.nan
+                gear_engine.calculate(g, prop, value)
+            done[spec] = [getattr(g, k) for k in gear_engine.FIELDS]
+        for k, value in zip(gear_engine.FIELDS, done[spec]):
+            results[k].append(value)
+    return results
+
+# These functions yield the records of a CSV or JSON-lines file as lists of chunk records (dicts) at a time
+def read_csv(f, chunk):
+    reader = csv.DictReader(f)
+    while True:
+        records = list(islice(reader, chunk))
+        if not records:
+            return
+        yield records
+
+def read_jsonl(f, chunk):
+    lines = (s for s in f if s.strip())
+    while True:
+        records = [json.loads(s) for s in islice(lines, chunk)]
+        if not records:
+            return
+        yield records
+
+# This function returns record as a line of JSON, with NaN and infinite numbers as null
+def json_line(record):
+    return json.dumps({k: None if isinstance(v, float) and not math.isfinite(v) else v for k, v in record.items()}) + "\n"
+
+# This function reads the records of f, works out each gear's properties, and writes them to out
+def run(f, out, fmt="csv", to="csv", chunk=10000, metric=True):
+    parsed = Parsed()
+    writer = None
+    count = 0
+    for records in (read_csv if fmt == "csv" else read_jsonl)(f, chunk):
+        keys = set().union(*records)
+        columns = {name: [parsed.field(r.get(name)) for r in records] for name in COLUMNS & keys}
+        results = evaluate(columns, len(records), metric)
+        for i, r in enumerate(records):
+            r.update((k, results[k][i]) for k in gear_engine.FIELDS)
+        if to == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(records[0]) + [k for k in gear_engine.FIELDS if k not in records[0]], extrasaction="ignore")
+                writer.writeheader()
+            writer.writerows(records)
+        else:
+            out.writelines(map(json_line, records))
+        count += len(records)
+    if parsed.errors:
+        print(f"{parsed.errors} unreadable value(s) in {count} records, given as {'NaN' if to == 'csv' else 'null'}", file=sys.stderr)
+    return count
+
+if __name__ == "__main__":
+    fname = None
+    oname = None
+    fmt = None
+    to = None
+    chunk = 10000
+    metric = True
+    args = iter(sys.argv[1:])
+    for a in args:
+        if a == "-o":
+            oname = next(args)
+        elif a == "--from":
+            fmt = next(args)
+        elif a == "--to":
+            to = next(args)
+        elif a == "--chunk":
+            chunk = int(next(args))
+        elif a == "--imperial":
+            metric = False
+        else:
+            fname = a
+    kind = lambda name: "jsonl" if name and name.endswith((".jsonl", ".json")) else "csv"
+    fmt = fmt or kind(fname)
+    to = to or (kind(oname) if oname and oname != "-" else fmt)
+    f = open(fname, newline="") if fname and fname != "-" else sys.stdin
+    out = open(oname, "w", newline="") if oname and oname != "-" else sys.stdout
+    try:
+        run(f, out, fmt, to, chunk, metric)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,200 @@
+# Gear mesh calculations - the arithmetic of the gears of gear_properties.py, with no tkinter
+# The functions here work on any object with a gear's properties as attributes (no_teeth, m, dp, d, od, id,
+# w, v, t, f, p and metric), whether those are plain numbers, for a single gear, or
+# NumPy arrays, as in a GearSet, so that a great many gears can be worked out at once.
+
+import math
+import sys
+from contextlib import nullcontext
+
+FIELDS = ("no_teeth", "m", "dp", "d", "od", "id", "w", "v", "t", "f", "p")
+GEOMETRY = ("no_teeth", "p_o_m", "d", "od", "id") # Properties which cannot be set to zero
+DEFAULTS = {"no_teeth": 6, "m": 1, "dp": 1, "d": 6, "od": 8, "id": 3.5, "w": 0, "v": 0, "t": 0, "f": 0, "p": 0} # As for a new Gear
+
+# NumPy is only needed for arrays of gears, so it is not imported until it is asked for, as gear_engine.np or
+# by making a GearSet; None if it is not installed.  Any arrays met before then must have come from NumPy, so
+# the functions below only look for it among the modules already imported.
+def numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def __getattr__(name):
+    if name == "np":
+        return numpy()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Silences NumPy's warnings on dividing by zero, which where() makes harmless
+def quiet():
+    np = sys.modules.get("numpy")
+    return np.errstate(divide="ignore", invalid="ignore") if np is not None else nullcontext()
+
+def is_array(x):
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(x, np.ndarray)
+
+# Chooses a where cond is true and b where it is not, for numbers or arrays alike
+def where(cond, a, b):
+    if is_array(cond) or is_array(a) or is_array(b):
+        return sys.modules["numpy"].where(cond, a, b)
+    return a if cond else b
+
+# Divides a by b; for plain numbers, dividing by zero gives NaN rather than an error, as both sides of a
+# where() are worked out before one is chosen (NumPy does the same for arrays)
+def div(a, b):
+    if is_array(a) or is_array(b):
+        return sys.modules["numpy"].divide(a, b)
+    return a / b if b else math.nan
+
+# A set of gears held as arrays, one element per gear, starting from the same values as a new Gear
+class GearSet():
+    def __init__(self, size, metric=True, **values):
+        np = numpy()
+        if np is None:
+            raise ImportError("NumPy is needed for sets of gears")
+        defaults = dict(DEFAULTS, **values)
+        for k in FIELDS:
+            setattr(self, k, np.broadcast_to(np.asarray(defaults[k], dtype=float), (size,)).copy())
+        self.metric = np.broadcast_to(np.asarray(metric, dtype=bool), (size,)).copy()
+
+# The formulas relating a gear's properties, shared by the calculations below and by gear_train; metric may be
+# an array where the others are.  Torque is force times pitch radius, in N-m with diameters in mm or in lb-ft
+# with them in inches, and power is rotation speed times torque, in W or (from lb-ft/s) in horsepower
+def torque_factor(metric):
+    return where(metric, 2000, 24)
+
+def power_factor(metric):
+    return where(metric, 1, 550)
+
+def outer_diameter(d, m):
+    return d + 2 * m
+
+def inner_diameter(d, m):
+    return d - 2.5 * m
+
+def torque(f, d, metric):
+    return f * d / torque_factor(metric)
+
+def force(t, d, metric):
+    return div(t * torque_factor(metric), d)
+
+def power(w, t, metric):
+    return w * t / power_factor(metric)
+
+# The following functions are the overlapping sets of calculations that follow a change to a property.
+# Changes to properties could affect different variables in different ways.  In the calculations, some variables
+# are prioritized as not changing, such as number of teeth (which remains constant so that it can remain an integer),
+# and rotation rate (which is often fixed by a motor)
+
+def calc_diams(g): # Calculates the inner and outer diameters, whenever the pitch diameter (or module) is updated
+    g.od = outer_diameter(g.d, g.m) # Or the number of teeth, which can also change those parameters
+    g.id = inner_diameter(g.d, g.m)
+
+def calc_speeds(g): # Calculates the linear speed at edge, torque, and power whenever the pitch diameter is updated
+    g.v = g.w * g.d / 2 # In such cases, it is rotation speed that is presumed to be the same, and linear speed changed
+    g.t = torque(g.f, g.d, g.metric) # Force also remains the same, rather than torque
+    calc_power_from_speed(g)
+
+def calc_force(g): # Calculates force whenever torque is updated (which it is when power is updated, to keep rotation rate the same)
+    g.f = force(g.t, g.d, g.metric)
+
+def calc_power_from_speed(g): # Recalculates power whenever speed is updated, not affecting torque
+    g.p = power(g.w, g.t, g.metric)
+
+# This function updates the properties of the gear (or gears) g based on setting the given property to value.
+# Expected values to the property argument are "no_teeth", "p_o_m" (for pitch/module), "od", "id", and single
+# letter names.  When the number of teeth changes, keep says which remains constant, "pitch" (pitch and module)
+# or "diameter" (pitch diameter).  Geometric properties are never set to zero; gears given a zero for one are
+# left as they were.  Returns whether anything changed (for arrays, whether any gear might have).
+def calculate(g, property, value, keep="pitch"):
+    old = None
+    if property in GEOMETRY:
+        if is_array(value):
+            old = {k: getattr(g, k) for k in FIELDS}
+        elif value == 0:
+            return False
+    with quiet():
+        if property == "no_teeth": # Update properties based on number of teeth
+            g.no_teeth = value
+            if keep == "diameter": # If pitch diameter is to remain constant
+                g.m = div(g.d, g.no_teeth)
+                g.dp = div(g.no_teeth, g.d)
+            else: # If pitch and module are to remain constant
+                g.d = where(g.metric, g.no_teeth * g.m, div(g.no_teeth, g.dp))
+            calc_diams(g); calc_speeds(g)
+
+        elif property == "p_o_m": # Update properties based on pitch or module
+            g.m = where(g.metric, value, div(1, value)) # Number of teeth will remain the same to keep it an integer
+            g.dp = where(g.metric, div(1, value), value)
+            g.d = g.no_teeth * g.m
+            calc_diams(g); calc_speeds(g)
+
+        elif property == "d": # Update properties based on diameter.  Number of teeth will remain constant
+            g.d = value
+            g.m = div(g.d, g.no_teeth)
+            g.dp = div(1, g.m)
+            calc_diams(g); calc_speeds(g)
+
+        elif property == "od": # Update properties based on outer diameter.
+            g.od = value
+            g.m = div(g.od, 2 + g.no_teeth)
+            g.dp = div(1, g.m)
+            g.d = g.no_teeth * g.m
+            g.id = inner_diameter(g.d, g.m)
+            calc_speeds(g)
+
+        elif property == "id": # Update properties based on inner diameter.
+            g.id = value
+            g.m = div(g.id, g.no_teeth - 2.5)
+            g.dp = div(1, g.m)
+            g.d = g.no_teeth * g.m
+            g.od = outer_diameter(g.d, g.m)
+            calc_speeds(g)
+
+        elif property == "w": # Update properties based on rotation rate (rad/s)
+            g.w = value
+            g.v = g.w * g.d / 2
+            calc_power_from_speed(g)
+
+        elif property == "v": # Update properties based on linear speed
+            g.v = value
+            g.w = div(g.v * 2, g.d)
+            calc_power_from_speed(g)
+
+        elif property == "p": # Update properties based on power
+            g.p = value
+            # If rotation rate and torque are both unknown, it is unclear which to update, so neither is;
+            # if only rotation speed is unknown, it is found from torque; and if both are known, rotation speed
+            # is kept the same and torque found (either way taking horsepower to lb-ft/s if need be)
+            unknown_w = g.w == 0
+            find_w = where(unknown_w, g.t != 0, False)
+            w = div(g.p * power_factor(g.metric), g.t)
+            g.t = where(unknown_w, g.t, div(g.p * power_factor(g.metric), g.w))
+            g.w = where(find_w, w, g.w)
+            g.v = where(find_w, g.w * g.d / 2, g.v)
+            calc_force(g) # Update force based on torque
+
+        elif property == "f": # Update properties based on force
+            g.f = value
+            g.t = torque(g.f, g.d, g.metric)
+            calc_power_from_speed(g) # When updating force, assume same rotation rate, update power
+
+        elif property == "t": # Update properties based on torque
+            g.t = value
+            calc_force(g)
+            calc_power_from_speed(g) # Again, assume same rotation rate, update power
+
+    if old is not None: # Gears given a zero keep their old values
+        skip = value == 0
+        for k in FIELDS:
+            setattr(g, k, where(skip, old[k], getattr(g, k)))
+    return True
+
+# This function updates the gear (or gears) partner to mesh with g:  two meshing gears must have the same
+# pitch/module, and the same linear speed, and applying them the same force will effect the same power
+def mesh(g, partner):
+    calculate(partner, "p_o_m", where(g.metric, g.m, g.dp))
+    calculate(partner, "v", g.v)
+    calculate(partner, "f", g.f)
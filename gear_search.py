@@ -0,0 +1,149 @@
+# Gear pair search - finds the gear/pinion pairs that meet a target ratio, power, rotation speed and size
+# Given those targets, every pairing of tooth counts is tried for each standard module (or diametral pitch),
+# with the calculations of gear_engine.  Tooth counts that cannot fit within the maximum outer diameter, or
+# which would stray too far from the ratio, are never tried; the rest are worked out on a pool of processes,
+# one module at a time, and the best pairs are returned, those closest to the ratio and smallest first.
+# Run as:  python gear_search.py ratio power speed max_od [options]
+
+import heapq
+import math
+import sys
+from multiprocessing import Pool
+from types import SimpleNamespace
+
+import gear_engine
+from gear_engine import np
+
+MODULES = [0.5, 0.6, 0.8, 1, 1.25, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10, 12, 16, 20, 25] # Standard modules in mm
+PITCHES = [2, 2.5, 3, 4, 5, 6, 8, 10, 12, 16, 20, 24, 32, 48, 64] # Standard diametral pitches in teeth per inch
+
+# This function returns the pairs of tooth counts (pinion, gear) worth trying at the given pitch or module.
+# As od = d + 2m = (n + 2)m, no gear can have more than max_od / m - 2 teeth, and as id = d - 2.5m, none can
+# have 2.5 or fewer; the gear's teeth must also be within tolerance (a fraction) of ratio times the pinion's.
+def candidates(ratio, max_od, pitch, metric, teeth, tolerance):
+    m = pitch if metric else 1 / pitch
+    most = min(teeth[1], math.floor(max_od / m - 2 + 1e-9))
+    least = max(teeth[0], 3)
+    pairs = []
+    for n1 in range(least, most + 1):
+        lo = max(least, math.ceil(ratio * n1 * (1 - tolerance) - 1e-9))
+        hi = min(most, math.floor(ratio * n1 * (1 + tolerance) + 1e-9))
+        if lo > most: # The gear only gets bigger from here
+            break
+        pairs += [(n1, n2) for n2 in range(lo, hi + 1)]
+    return pairs
+
+# This function sets up pinion and gear (single gears or sets of them) with the given pitch and tooth counts,
+# drives the pinion at rotation speed w and power p, and meshes the gear with it
+def mesh_pair(pinion, gear, pitch, n1, n2, w, p):
+    for g, n in ((pinion, n1), (gear, n2)):
+        gear_engine.calculate(g, "p_o_m", pitch)
+        gear_engine.calculate(g, "no_teeth", n)
+    gear_engine.calculate(pinion, "w", w)
+    gear_engine.calculate(pinion, "p", p)
+    gear_engine.mesh(pinion, gear)
+
+KEYS = ["error", "pinion_teeth", "gear_teeth", "pitch", "pinion_d", "gear_d", "pinion_od", "gear_od", "gear_w", "gear_t", "f"]
+
+# This function returns the results for pairs of tooth counts, given as lists, arrays or plain numbers, as tuples
+# in the order of KEYS, each preceded by its rank:  pairs are ranked by how near they come to the ratio, then by
+# the size of the larger gear, then by force
+def results(ratio, pitch, n1, n2, pinion, gear):
+    error = (n2 / n1 - ratio) / ratio
+    values = [error, n1, n2, pitch, pinion.d, gear.d, pinion.od, gear.od, gear.w, gear.t, gear.f]
+    if gear_engine.is_array(n1):
+        values = [v.tolist() if gear_engine.is_array(v) else [v] * len(n1) for v in values]
+        ranks = zip(np.abs(error).tolist(), np.maximum(pinion.od, gear.od).tolist(), gear.f.tolist())
+        return list(zip(ranks, *values))
+    return [((abs(error), max(pinion.od, gear.od), gear.f),) + tuple(values)]
+
+# This function works out every pair worth trying at one pitch or module, and returns the best limit of those
+# that meet the constraints.  Its argument is a tuple, so that it can be handed to a pool
+def search_pitch(task):
+    ratio, p, w, max_od, pitch, metric, teeth, tolerance, max_force, limit = task
+    pairs = candidates(ratio, max_od, pitch, metric, teeth, tolerance)
+    if not pairs:
+        return []
+    if np is not None: # Work out the whole lot at once
+        n1, n2 = (np.array(n, dtype=float) for n in zip(*pairs))
+        pinion, gear = gear_engine.GearSet(len(pairs), metric), gear_engine.GearSet(len(pairs), metric)
+        mesh_pair(pinion, gear, pitch, n1, n2, w, p)
+        found = results(ratio, pitch, n1, n2, pinion, gear)
+    else:
+        found = []
+        for n1, n2 in pairs:
+            pinion = SimpleNamespace(metric=metric, **gear_engine.DEFAULTS)
+            gear = SimpleNamespace(metric=metric, **gear_engine.DEFAULTS)
+            mesh_pair(pinion, gear, pitch, n1, n2, w, p)
+            found += results(ratio, pitch, n1, n2, pinion, gear)
+    if max_force is not None:
+        found = [r for r in found if r[-1] <= max_force]
+    return heapq.nsmallest(limit, found)
+
+# This function returns the best limit pairs of gears, as dicts, with a speed ratio (gear teeth over pinion teeth)
+# within tolerance of ratio, transmitting power p with the pinion turning at w rad/s, and neither wider than max_od.
+# Power is in W and sizes in mm, or in hp and inches if metric is false; pitches are the modules (or diametral
+# pitches) to try, and teeth the least and most teeth a gear may have.  If max_force is given, pairs needing more
+# force at the mesh are left out.  The search is split among workers processes (by default, one per processor).
+def search(ratio, p, w, max_od, metric=True, pitches=None, teeth=(6, 200), tolerance=0.01, max_force=None, limit=20, workers=None):
+    if pitches is None:
+        pitches = MODULES if metric else PITCHES
+    tasks = [(ratio, p, w, max_od, pitch, metric, teeth, tolerance, max_force, limit) for pitch in pitches]
+    if workers == 1:
+        found = [r for rs in map(search_pitch, tasks) for r in rs]
+    else:
+        with Pool(workers) as pool:
+            found = [r for rs in pool.imap_unordered(search_pitch, tasks) for r in rs]
+    return [dict(zip(KEYS, r[1:])) for r in heapq.nsmallest(limit, found)]
+
+# This function checks that the pairs found by a small search, in metric and in imperial units, transmit the
+# power asked for:  rotation speed times torque (taken from lb-ft/s to hp) must come to p on both gears.
+# Returns whether they all do, printing any that do not.  Run with:  python gear_search.py --check
+def check(p=2, w=100):
+    ok = True
+    for metric, max_od in ((True, 200), (False, 10)):
+        factor = 1 if metric else 550
+        for r in search(3, p, w, max_od, metric=metric, limit=50, workers=1):
+            # The gear's speed and torque, and the pinion's (torque scaling with the number of teeth)
+            for power in (r["gear_w"] * r["gear_t"] / factor, w * r["gear_t"] * r["pinion_teeth"] / r["gear_teeth"] / factor):
+                if abs(power - p) > 1e-9 * p:
+                    print(f"{'Metric' if metric else 'Imperial'} pair {r['pinion_teeth']:g}:{r['gear_teeth']:g} "
+                          f"transmits {power:g}, not {p:g}")
+                    ok = False
+    return ok
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        ok = check()
+        print("ok" if ok else "failed")
+        sys.exit(0 if ok else 1)
+    options = {}
+    positional = []
+    args = iter(sys.argv[1:])
+    for a in args:
+        if a == "--imperial":
+            options["metric"] = False
+        elif a == "--pitches":
+            options["pitches"] = [float(x) for x in next(args).split(",")]
+        elif a == "--teeth":
+            options["teeth"] = tuple(int(x) for x in next(args).split(":"))
+        elif a == "--tolerance":
+            options["tolerance"] = float(next(args))
+        elif a == "--max-force":
+            options["max_force"] = float(next(args))
+        elif a == "-n":
+            options["limit"] = int(next(args))
+        elif a == "-j":
+            options["workers"] = int(next(args))
+        else:
+            positional.append(float(a))
+    if len(positional) != 4:
+        print("Usage: python gear_search.py ratio power speed max_od [--imperial] [--pitches a,b,...] [--teeth least:most]")
+        print("       [--tolerance fraction] [--max-force f] [-n results] [-j workers]")
+        print("   or: python gear_search.py --check")
+        sys.exit(1)
+    metric = options.get("metric", True)
+    units = ("Module", "mm", "N-m", "N") if metric else ("Pitch", "in.", "lb-ft", "lbs")
+    print(f"{units[0]:>8} {'Teeth':>9} {'Ratio err.':>10} {'Diameters (' + units[1] + ')':>22} {'Outer (' + units[1] + ')':>20} {'Gear rad/s':>11} {'Torque (' + units[2] + ')':>14} {'Force (' + units[3] + ')':>12}")
+    for r in search(*positional, **options):
+        print(f"{r['pitch']:>8g} {int(r['pinion_teeth']):>4}:{int(r['gear_teeth']):<4} {r['error']:>10.2%} {r['pinion_d']:>10.4g} {r['gear_d']:>11.4g} {r['pinion_od']:>9.4g} {r['gear_od']:>10.4g} {r['gear_w']:>11.4g} {r['gear_t']:>14.4g} {r['f']:>12.4g}")
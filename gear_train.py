@@ -0,0 +1,199 @@
+# Gear trains - any number of gears, meshed or sharing shafts, with their properties kept in a dependency graph
+# Every property of every gear is a node, worked out from the nodes it depends on:  a gear's pitch diameter from
+# its number of teeth and module, its rotation speed from the linear speed and diameter of the gear it meshes
+# with, and so on.  Only a few nodes are set directly - each gear's number of teeth, the module of each set of
+# meshing gears, and the rotation speed and force of the first gear, which drives the rest - so that a change to
+# any property is made by changing those.  Then only the nodes that depend on what changed are recalculated, each
+# once, in order, and those whose values stay the same stop the change spreading any further.  Whatever watches
+# the train is told of everything that changed at the end, all at once.
+
+import heapq
+
+import gear_engine
+
+# Defaults for the nodes that are set directly, as for a new Gear
+INPUTS = {"m": 1, "no_teeth": 6, "w": 0, "f": 0}
+
+class GearTrain():
+    def __init__(self, metric=True):
+        self.metric = metric # Whether lengths are in mm (or inches), forces in N (or lbs), power in W (or hp)
+        self.parents = [] # For each gear, the gear it is driven by and how ("mesh" or "shaft"), or None for the first
+        self.nodes = [] # For each node, its key (gear, property), the function that works it out and the keys it
+        self.index = {} # depends on (or None and nothing, if it is set directly), in an order where every node
+        self.values = {} # comes after all those it depends on; index gives each key's place in that order
+        self.dependents = {}
+        self.watchers = []
+        self.add()
+
+    # Power is rotation speed times torque, in W or (from lb-ft/s) in horsepower, as in gear_engine
+    def power_factor(self):
+        return gear_engine.power_factor(self.metric)
+
+    def node(self, key, func=None, *deps):
+        self.index[key] = len(self.nodes)
+        self.nodes.append((key, func, deps))
+        self.dependents[key] = []
+        for d in deps:
+            self.dependents[d].append(key)
+        self.values[key] = INPUTS[key[1]] if func is None else func(*(self.values[d] for d in deps))
+
+    # This function adds a gear to the train, which either meshes with gear mesh_with or turns on the same shaft
+    # as gear shaft_with, and returns its number; the first gear (number 0) is added with the train and drives it.
+    # Meshing gears share a module, and have the same linear speed and force at the mesh; gears on the same shaft
+    # have the same rotation speed and torque.
+    def add(self, mesh_with=None, shaft_with=None):
+        k = len(self.parents)
+        if mesh_with is not None:
+            j, how = mesh_with, "mesh"
+        elif shaft_with is not None:
+            j, how = shaft_with, "shaft"
+        elif k == 0:
+            j, how = None, None
+        else:
+            raise ValueError("A new gear must mesh with, or share a shaft with, a gear of the train")
+        self.parents.append((j, how) if j is not None else None)
+        node = self.node
+        if how == "mesh":
+            node((k, "m"), lambda m: m, (j, "m"))
+        else:
+            node((k, "m"))
+        node((k, "dp"), lambda m: 1 / m, (k, "m"))
+        node((k, "no_teeth"))
+        node((k, "d"), lambda n, m: n * m, (k, "no_teeth"), (k, "m"))
+        node((k, "od"), gear_engine.outer_diameter, (k, "d"), (k, "m"))
+        node((k, "id"), gear_engine.inner_diameter, (k, "d"), (k, "m"))
+        if how == "mesh":
+            node((k, "w"), lambda v, d: v * 2 / d, (j, "v"), (k, "d"))
+        elif how == "shaft":
+            node((k, "w"), lambda w: w, (j, "w"))
+        else:
+            node((k, "w"))
+        node((k, "v"), lambda w, d: w * d / 2, (k, "w"), (k, "d"))
+        if how == "mesh":
+            node((k, "f"), lambda f: f, (j, "f"))
+        elif how == "shaft":
+            node((k, "f"), lambda t, d: gear_engine.force(t, d, self.metric), (j, "t"), (k, "d"))
+        else:
+            node((k, "f"))
+        node((k, "t"), lambda f, d: gear_engine.torque(f, d, self.metric), (k, "f"), (k, "d"))
+        node((k, "p"), lambda w, t: gear_engine.power(w, t, self.metric), (k, "w"), (k, "t"))
+        return k
+
+    def get(self, k, property):
+        return self.values[(k, property)]
+
+    # This function calls callback with the set of keys of the nodes that changed, once after every change
+    def watch(self, callback):
+        self.watchers.append(callback)
+
+    # This function sets the nodes given as keys of inputs to their values, and recalculates the nodes that depend
+    # on them (or every node, if everything is true), in order, skipping those whose inputs did not change.
+    # Returns the set of keys of nodes which changed.  Watchers are told unless notify is false, in which case the
+    # changes are added to the set changed, if given
+    def update(self, inputs, everything=False, notify=True, changed=None):
+        changed = set() if changed is None else changed
+        queue = list(range(len(self.nodes))) if everything else []
+        queued = set(queue)
+        def dirty(key):
+            for d in self.dependents[key]:
+                if self.index[d] not in queued:
+                    queued.add(self.index[d])
+                    heapq.heappush(queue, self.index[d])
+        for key, value in inputs.items():
+            if self.values[key] != value:
+                self.values[key] = value
+                changed.add(key)
+                dirty(key)
+        while queue:
+            key, func, deps = self.nodes[heapq.heappop(queue)]
+            if func is None:
+                continue
+            value = func(*(self.values[d] for d in deps))
+            if value != self.values[key]:
+                self.values[key] = value
+                changed.add(key)
+                dirty(key)
+        if changed and notify:
+            for callback in self.watchers:
+                callback(changed)
+        return changed
+
+    # The gear whose module is shared by all the gears meshing (directly or not) with gear k
+    def module_gear(self, k):
+        while self.parents[k] is not None and self.parents[k][1] == "mesh":
+            k = self.parents[k][0]
+        return k
+
+    # The rotation speed of gear k as a fraction of that of the first gear
+    def speed_ratio(self, k):
+        r = 1
+        while self.parents[k] is not None:
+            j, how = self.parents[k]
+            if how == "mesh":
+                r *= self.get(j, "d") / self.get(k, "d")
+            k = j
+        return r
+
+    # This function changes the property of gear k to value, as Gear.calculate() does in the window.  Expected
+    # values to the property argument are "no_teeth", "p_o_m" (for pitch/module), "od", "id", and single letter
+    # names.  When the number of teeth changes, keep says which remains constant, "pitch" (pitch and module) or
+    # "diameter" (pitch diameter).  Geometric changes keep the rotation speed of, and force on, gear hold (by
+    # default the first gear, so only gears after the one changed are affected); other changes keep the rotation
+    # speed of the first gear where they can, as power is the same through the train.
+    # Returns whether the change could be made.
+    def set(self, k, property, value, keep="pitch", hold=0):
+        if property in gear_engine.GEOMETRY and value == 0: # Geometric properties cannot be zero
+            return False
+        n = self.get(k, "no_teeth")
+        module = (self.module_gear(k), "m")
+        w, f, r = (0, "w"), (0, "f"), self.speed_ratio(k)
+        to_force = lambda t: gear_engine.force(t, self.get(0, "d"), self.metric) # Force on the first gear for torque t
+        if property == "no_teeth":
+            inputs = {(k, "no_teeth"): value}
+            if keep == "diameter":
+                inputs[module] = self.get(k, "d") / value
+        elif property == "p_o_m":
+            inputs = {module: value if self.metric else 1 / value}
+        elif property == "d":
+            inputs = {module: value / n}
+        elif property == "od":
+            inputs = {module: value / (n + 2)}
+        elif property == "id":
+            inputs = {module: value / (n - 2.5)}
+        elif property == "w":
+            inputs = {w: value / r}
+        elif property == "v":
+            inputs = {w: value * 2 / self.get(k, "d") / r}
+        elif property == "t": # Torque is inversely proportional to rotation speed
+            inputs = {f: to_force(value * r)}
+        elif property == "f":
+            inputs = {f: to_force(gear_engine.torque(value, self.get(k, "d"), self.metric) * r)}
+        elif property == "p":
+            if self.get(*w) != 0: # Keep rotation speed the same, if it is known
+                inputs = {f: to_force(value * self.power_factor() / self.get(*w))}
+            elif self.get(0, "t") != 0: # Otherwise, find it from torque
+                inputs = {w: value * self.power_factor() / self.get(0, "t")}
+            else: # If neither is known, it is unclear which to update
+                return False
+        else:
+            raise ValueError(f"Unknown property: {property}")
+        if property not in gear_engine.GEOMETRY or hold == 0:
+            self.update(inputs)
+            return True
+        speed, force = self.get(hold, "w"), self.get(hold, "f")
+        changed = self.update(inputs, notify=False)
+        r = self.speed_ratio(hold) # Then find the speed of, and force on, the first gear that keep those of gear hold
+        self.update({w: speed / r, f: to_force(gear_engine.torque(force, self.get(hold, "d"), self.metric) * r)}, changed=changed)
+        return True
+
+    # This function switches the train between metric and imperial units, converting lengths and forces
+    def set_metric(self, metric):
+        if metric == self.metric:
+            return
+        length, force = (25.4, 4.45) if metric else (1 / 25.4, 1 / 4.45)
+        self.metric = metric
+        inputs = {(0, "f"): self.get(0, "f") * force}
+        for key, func, deps in self.nodes:
+            if func is None and key[1] == "m":
+                inputs[key] = self.values[key] * length
+        self.update(inputs, everything=True)
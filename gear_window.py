@@ -0,0 +1,204 @@
+# Gear property window - the Tkinter half of gear_properties.py, which opens it:  python gear_properties.py
+
+import tkinter as tk
+from tkinter import ttk
+from tkinter import simpledialog
+from tkinter import font as tkFont
+
+import gear_train
+from gear_properties import DECIMAL_PLACES, sfloat
+
+# The gear class shows a gear of a gear train (see gear_train.py), which holds the
+# gear's properties and the formulas for calculating some based on others.  Gear
+# objects have a set of tkinter StringVars which can be tied to text boxes for
+# modification of these properties.
+class Gear():
+    def __init__(self, window, train, k):
+        self.window = window # Used so I can produce a dialog box
+        self.train = train # The gear train holding the gear's properties, in which it is gear number k
+        self.k = k
+
+        # String variables for connection to text box
+        self.n_str = tk.StringVar()
+        self.mp_str = tk.StringVar()
+        self.d_str = tk.StringVar()
+        self.od_str = tk.StringVar()
+        self.id_str = tk.StringVar()
+
+        self.w_str = tk.StringVar()
+        self.v_str = tk.StringVar()
+        self.t_str = tk.StringVar()
+        self.f_str = tk.StringVar()
+        self.p_str = tk.StringVar()
+        self.strings = {"no_teeth": self.n_str, "d": self.d_str, "od": self.od_str, "id": self.id_str,
+                        "w": self.w_str, "v": self.v_str, "t": self.t_str, "f": self.f_str, "p": self.p_str}
+    
+    # This function updates a the properties of a gear based on a change to the property given by the property argument,
+    # read from its text box.  The gear train then updates those of every other gear, and has them shown.  The gear keeps
+    # its own rotation speed and force through changes to its geometry, as it always has.
+    # Expected values to the property argument are "no_teeth", "p_o_m" (for pitch/module), "od", "id", and single letter names
+    def calculate(self, property):
+        value = sfloat((self.mp_str if property == "p_o_m" else self.strings[property]).get())
+        keep = "pitch"
+        if property == "no_teeth" and value != 0: # Changing the number of teeth must change either pitch or pitch diameter
+            if simpledialog.SimpleDialog(self.window, text="Which should remain constant?", buttons=["Pitch/Module","Pitch diameter",]).go():
+                keep = "diameter"
+        self.train.set(self.k, property, value, keep, hold=self.k)
+    
+    # Show variable values in text boxes - all of them, or only those named in changed
+    def display(self, changed=None):
+        get = lambda name: self.train.get(self.k, name)
+        if changed is None or "m" in changed:
+            self.mp_str.set(round(get("m" if self.train.metric else "dp"), DECIMAL_PLACES))
+        for name, string in self.strings.items():
+            if changed is None or name in changed:
+                string.set(int(get(name)) if name == "no_teeth" else round(get(name), DECIMAL_PLACES))
+
+class GearWindow(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        # The window holds the program, and thus holds both gear objects
+        self.title("Gear Mesh Properties")
+        self.train = gear_train.GearTrain()
+        self.gear = Gear(self, self.train, 0)
+        self.pinion = Gear(self, self.train, self.train.add(mesh_with=0))
+        self.gear.display()
+        self.pinion.display()
+
+        def show(changed): # Show each gear's changed values, once the train has worked them all out
+            for gear in [self.gear, self.pinion]:
+                names = {name for k, name in changed if k == gear.k}
+                if names:
+                    gear.display(names)
+        self.train.watch(show)
+
+        # Window is composed of three label frames - Units, Geometry, and Motion
+        masterframe = ttk.Frame(self, padding=12)
+        masterframe.pack()
+        unitframe = tk.LabelFrame(masterframe, text="Units")
+        geometryframe = tk.LabelFrame(masterframe, text="Geometry")
+        motionframe = tk.LabelFrame(masterframe, text="Motion")
+        unitframe.pack(expand=True, fill='x', padx=6, pady=6)
+        geometryframe.pack(expand=True, fill='x', padx=6, pady=6)
+        motionframe.pack(expand=True, fill='x', padx=6, pady=6)
+        geargeoframe = ttk.Frame(geometryframe, padding=5)
+        pinigeoframe = ttk.Frame(geometryframe, padding=5)
+        geometryframe.columnconfigure(0, weight=1)
+        geometryframe.columnconfigure(1, weight=1)
+        geargeoframe.grid(column=0, row=0)
+        pinigeoframe.grid(column=1, row=0)
+        gearmoframe = ttk.Frame(motionframe, padding=5)
+        pinimoframe = ttk.Frame(motionframe, padding=5)
+        gearmoframe.grid(column=0, row=0)
+        pinimoframe.grid(column=1, row=0, sticky=tk.N)
+
+        HEADING_FONT = tkFont.nametofont("TkHeadingFont")
+        HEADING_FONT.configure(underline=True)
+
+        # Entries are attached to gear properties
+                # Various entries exist, attached to most gear properties.  These will be placed below.
+        self.entries = [
+            ttk.Entry(geargeoframe, textvariable=self.gear.mp_str),
+            ttk.Entry(geargeoframe, textvariable=self.gear.n_str),
+            ttk.Entry(geargeoframe, textvariable=self.gear.d_str),
+            ttk.Entry(geargeoframe, textvariable=self.gear.od_str),
+            ttk.Entry(geargeoframe, textvariable=self.gear.id_str),
+            ttk.Entry(pinigeoframe, textvariable=self.pinion.mp_str),
+            ttk.Entry(pinigeoframe, textvariable=self.pinion.n_str),
+            ttk.Entry(pinigeoframe, textvariable=self.pinion.d_str),
+            ttk.Entry(pinigeoframe, textvariable=self.pinion.od_str),
+            ttk.Entry(pinigeoframe, textvariable=self.pinion.id_str),
+
+            ttk.Entry(gearmoframe, textvariable=self.gear.w_str),
+            ttk.Entry(gearmoframe, textvariable=self.gear.v_str),
+            ttk.Entry(gearmoframe, textvariable=self.gear.t_str),
+            ttk.Entry(gearmoframe, textvariable=self.gear.f_str),
+            ttk.Entry(gearmoframe, textvariable=self.gear.p_str),
+            ttk.Entry(pinimoframe, textvariable=self.pinion.w_str),
+            ttk.Entry(pinimoframe, textvariable=self.pinion.v_str),
+            ttk.Entry(pinimoframe, textvariable=self.pinion.t_str),
+        ]
+
+        # The units frame consists of a label and a combobox
+        ttk.Label(unitframe, text="System of measurement:").grid(column=0, row=0, padx=5)
+        self.units = tk.StringVar() # Units can be inches or metric; unit_box is the box that allows one to switch between them
+        self.unit_box = ttk.Combobox(unitframe, textvariable=self.units, values=("Imperial","Metric"), state="readonly")
+        self.unit_box.grid(column=1,row=0,pady=5, padx=5)
+        self.unit_box.set("Metric")
+
+        # The geometry frame contains two headers and a pair of sets of three columns:  labels of gear properties, entries, and unit labels.
+        ttk.Label(geargeoframe, text="Gear", font="TkHeadingFont").grid(column=0, row=0, sticky=tk.W)
+        ttk.Label(pinigeoframe, text="Pinion", font="TkHeadingFont").grid(column=0, row=0, sticky=tk.W)
+        # One pair of property labels is dynamic, changing from pitch to module as units switch
+        self.dprop_labels = [ttk.Label(geargeoframe, text="Module:"), ttk.Label(pinigeoframe, text="Module:")]
+        for i in range(2):
+            self.dprop_labels[i].grid(column = 0, row=1, sticky=tk.E)
+            self.entries[i * 5].grid(column=1, row=1, pady=3)
+        # Other property labels are static
+        stat_prop_list = ["No. of teeth:", "Pitch diameter:", "Inner diameter:", "Outer diameter:"]
+        for i in range(len(stat_prop_list)):
+            ttk.Label(geargeoframe, text=stat_prop_list[i]).grid(column=0, row = 2 + i, sticky=tk.E)
+            ttk.Label(pinigeoframe, text=stat_prop_list[i]).grid(column=0, row = 2 + i, sticky=tk.E)
+            self.entries[i + 1].grid(column=1, row= 2 + i, pady=3)
+            self.entries[i + 6].grid(column=1, row= 2 + i, pady=3)
+        # Unit labels are dynamic.  Number of teeth has no label
+        self.unit_labels = [ttk.Label(geargeoframe, text="mm"), ttk.Label(pinigeoframe, text="mm")]
+        for i in range(2):
+            self.unit_labels[i].grid(column = 2, row=1, sticky=tk.W)
+        for i in range(3, len(stat_prop_list) + 2):
+            self.unit_labels.append(ttk.Label(geargeoframe, text="mm"))
+            self.unit_labels.append(ttk.Label(pinigeoframe, text="mm"))
+            for j in range(1,3):
+                self.unit_labels[-j].grid(column = 2, row = i, sticky=tk.W)
+        
+        # The motion frame is similar to the geometry frame, though some properties do not appear on both sides
+        stat_prop_list = ["Rotation speed:", "Speed at mesh:", "Torque:"]
+        for i in range(len(stat_prop_list)):
+            ttk.Label(gearmoframe, text=stat_prop_list[i]).grid(column=0, row = i, sticky=tk.E)
+            ttk.Label(pinimoframe, text=stat_prop_list[i]).grid(column=0, row = i, sticky=tk.E)
+        ttk.Label(gearmoframe, text="Force at contact:").grid(column=0, row=len(stat_prop_list), sticky=tk.E)
+        ttk.Label(gearmoframe, text="Power transmission:").grid(column=0, row=len(stat_prop_list)+1, sticky=tk.E)
+        special_metric_units = ["rad/s", "mm/s", "N-m", "N", "W"]
+        special_imperial_units = ["rad/s", "in/s", "lb-ft", "lbs", "hp"]
+        self.special_unit_labels = []
+        for i in range(len(special_metric_units)):
+            self.special_unit_labels.append(ttk.Label(gearmoframe, text=special_metric_units[i]))
+            self.special_unit_labels[-1].grid(column=2, row = i, sticky=tk.W)
+            self.entries[i + 10].grid(column=1, row=i, pady=3)
+            if i < 3:
+                self.special_unit_labels.append(ttk.Label(pinimoframe, text=special_metric_units[i]))
+                self.special_unit_labels[-1].grid(column=2, row = i, sticky=tk.W)
+                self.entries[i + 15].grid(column=1, row=i, pady=3)
+        
+        # Rendering the window functional
+        # First, tie entries to calculations
+        property_args = ["p_o_m","no_teeth","d","od","id"]
+        for i in range(5):
+            self.entries[i].bind("<Return>", lambda event, p = property_args[i % 5]: self.gear.calculate(p))
+            self.entries[i + 5].bind("<Return>", lambda event, p = property_args[i % 5]: self.pinion.calculate(p))
+        property_args = ["w","v","t"]
+        for i in range(3):
+            self.entries[10 + i].bind("<Return>", lambda event, p = property_args[i]: self.gear.calculate(p))
+            self.entries[15 + i].bind("<Return>", lambda event, p = property_args[i]: self.pinion.calculate(p))
+        self.entries[-5].bind("<Return>", lambda event: self.gear.calculate("f"))
+        self.entries[-4].bind("<Return>", lambda event: self.gear.calculate("p"))
+
+        # The role of the unit frame's combobox is determined by the function below
+        def unit_swap(e):
+            if self.unit_box.current(): # This part, when changing to metric,
+                for each in self.dprop_labels:
+                    each.config(text="Module:")
+                for each in self.unit_labels:
+                    each.config(text="mm")
+                for each in self.special_unit_labels:
+                    each.config(text=special_metric_units[special_imperial_units.index(each['text'])])
+            else:                       # And this part, when changing to inches
+                for each in self.dprop_labels:
+                    each.config(text="Diam. pitch:")
+                for each in self.unit_labels:
+                    each.config(text="in.")
+                self.unit_labels[0].config(text="/in."); self.unit_labels[1].config(text="/in.")
+                for each in self.special_unit_labels:
+                    each.config(text=special_imperial_units[special_metric_units.index(each['text'])])
+            self.train.set_metric(bool(self.unit_box.current())) # Convert lengths and forces, and show the results
+        self.unit_box.bind("<<ComboboxSelected>>", unit_swap)